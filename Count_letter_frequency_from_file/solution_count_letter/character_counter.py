@@ -0,0 +1,120 @@
+''' This module counts the characters of utf-8 bytes, skipping decoding for ascii data '''
+import codecs
+import io
+import unicodedata
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+LINE_FEED, CARRIAGE_RETURN = 10, 13
+
+
+class CharacterCounter:
+    """ Count every character of utf-8 bytes fed in chunks, translating newlines like
+    read_file() does. Ascii chunks are counted as bytes without being decoded """
+
+    def __init__(self):
+        """
+        Construct all the necessary attributes for the CharacterCounter object.
+        """
+        self.histogram = Counter()
+        self.decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), True)
+
+
+    def feed(self, chunk):
+        """ Count the characters of the next chunk of bytes
+        Args:
+            chunk: (bytes)
+        """
+        buffered, flags = self.decoder.getstate()
+        if buffered or not chunk.isascii():
+            self.histogram.update(self.decoder.decode(chunk))
+            return
+
+        # The decoder keeps a '\r' seen at the end of the previous chunk in its flags
+        pending_cr = flags & 1
+        trailing_cr = chunk.endswith(b'\r')
+        counts = byte_counts(chunk)
+        line_feeds = counts.pop(LINE_FEED, 0)
+        carriage_returns = counts.pop(CARRIAGE_RETURN, 0)
+        windows_newlines = chunk.count(b'\r\n') + (pending_cr and chunk.startswith(b'\n'))
+
+        # Each '\r' becomes '\n' unless a '\n' follows it, a trailing one waits for the next chunk
+        newlines = line_feeds + carriage_returns + pending_cr - trailing_cr - windows_newlines
+        if newlines:
+            self.histogram['\n'] += newlines
+        for byte, count in counts.items():
+            self.histogram[chr(byte)] += count
+        self.decoder.setstate((b'', int(trailing_cr)))
+
+
+    def finish(self):
+        """ Count what the decoder still holds at the end of the data
+        Returns:
+            characters' frequencies: Counter
+        """
+        self.histogram.update(self.decoder.decode(b'', final=True))
+        return self.histogram
+
+
+def byte_counts(chunk):
+    """ Count the occurrences of every byte value in chunk
+    Args:
+        chunk: (bytes)
+    Returns:
+        byte values' frequencies: dict
+    """
+    if np is None:
+        return Counter(chunk)
+    counts = np.bincount(np.frombuffer(chunk, dtype=np.uint8), minlength=256)
+    present = np.flatnonzero(counts)
+    return dict(zip(present.tolist(), counts[present].tolist()))
+
+
+def normalize_text(text, ignore_case=False, normalization=None):
+    """ Apply unicode normalization and case folding to text
+    Args:
+        text: (str)
+        ignore_case: (bool) case fold the text
+        normalization: (str) 'NFC', 'NFKC', 'NFD' or 'NFKD', None to keep the text as is
+    Returns:
+        normalized text: str
+    """
+    if normalization:
+        text = unicodedata.normalize(normalization, text)
+    if ignore_case:
+        text = text.casefold()
+        if normalization:
+            text = unicodedata.normalize(normalization, text)
+    return text
+
+
+def normalize_chunks(chunks, ignore_case=False, normalization=None):
+    """ Apply normalize_text() to a stream of text chunks without joining them.
+    The last character of each chunk and the combining marks after it are carried
+    to the next chunk, since normalization may combine them with what follows
+    Args:
+        chunks: (iterable) text chunks
+        ignore_case: (bool) case fold the text
+        normalization: (str) 'NFC', 'NFKC', 'NFD' or 'NFKD', None to keep the text as is
+    Yields:
+        normalized text: str
+    """
+    carry = ''
+    for text in chunks:
+        if not normalization:
+            yield normalize_text(text, ignore_case)
+            continue
+
+        text = carry + text
+        cut = len(text) - 1
+        while cut > 0 and unicodedata.combining(text[cut]):
+            cut -= 1
+        carry = text[max(cut, 0):]
+        yield normalize_text(text[:max(cut, 0)], ignore_case, normalization)
+    if carry:
+        yield normalize_text(carry, ignore_case, normalization)
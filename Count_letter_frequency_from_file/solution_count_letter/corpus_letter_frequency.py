@@ -0,0 +1,141 @@
+''' This module counts the frequency of every letter across many files using a process pool '''
+import glob
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .file_letter_frequency import CHUNK_SIZE, INDEX_SUFFIX, LetterFrequency
+
+
+# Files bigger than this are split into byte ranges counted by different workers
+SPLIT_SIZE = 1 << 28
+GLOB_CHARACTERS = '*?['
+
+
+def collect_paths(source):
+    """ Expand a corpus source into a sorted list of file paths
+    Args:
+        source: (str | list) a directory (walked recursively), a glob pattern,
+            a single file path or a list of file paths
+    Returns:
+        file paths: list
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return [os.fspath(path) for path in source]
+
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        paths = [os.path.join(directory, name)
+                 for directory, _, names in os.walk(source) for name in names]
+    elif any(character in source for character in GLOB_CHARACTERS):
+        paths = [path for path in glob.glob(source, recursive=True) if os.path.isfile(path)]
+    else:
+        paths = [source]
+    return sorted(path for path in paths if not path.endswith(INDEX_SUFFIX))
+
+
+def character_boundary(file, offset):
+    """ Move offset forward to the start of a character, so a range ending there
+    doesn't split a utf-8 sequence or a windows line ending
+    Args:
+        file: binary file object
+        offset: (int) byte offset
+    Returns:
+        character boundary offset: int
+    """
+    file.seek(offset - 1)
+    previous, following = file.read(1), file.read(4)
+    skipped = 0
+    while skipped < len(following) and following[skipped] & 0xC0 == 0x80:
+        skipped += 1
+    if not skipped and previous == b'\r' and following[:1] == b'\n':
+        skipped = 1
+    return offset + skipped
+
+
+def split_file(path, split_size=SPLIT_SIZE):
+    """ Split a file into byte ranges of about split_size that end on character boundaries
+    Args:
+        path: (str) file path
+        split_size: (int)
+    Returns:
+        ranges: list of (path, start, end) tuples, end is None for the end of the file
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        # Let the worker report the error for this file
+        return [(path, 0, None)]
+    if size <= split_size:
+        return [(path, 0, None)]
+
+    ranges = []
+    start = 0
+    with open(path, 'rb') as file:
+        while start + split_size < size:
+            end = character_boundary(file, start + split_size)
+            ranges.append((path, start, end))
+            start = end
+    ranges.append((path, start, None))
+    return ranges
+
+
+def count_range(task, chunk_size=CHUNK_SIZE):
+    """ Count every character in a byte range of a file, runs inside a worker process
+    Args:
+        task: (tuple) path, start and end byte offsets
+        chunk_size: (int)
+    Returns:
+        path: str
+        characters' frequencies: Counter
+    """
+    path, start, end = task
+    try:
+        histogram, _ = LetterFrequency(path).scan_file(chunk_size, start, end)
+    except (FileNotFoundError, IOError, OSError, UnicodeDecodeError) as error:
+        print(f"{type(error)}: {error}")
+        histogram = Counter()
+    return path, histogram
+
+
+def corpus_histogram(source, workers=None, split_size=SPLIT_SIZE, per_file=False):
+    """ Count the frequency of every character across a corpus of files,
+    spreading files and ranges of big files across a process pool
+    Args:
+        source: (str | list) a directory, a glob pattern, a file path or a list of file paths
+        workers: (int) number of processes, 1 counts in this process,
+            None uses one process per cpu
+        split_size: (int) files bigger than this are split into byte ranges
+        per_file: (bool) return a histogram per file as well
+    Returns:
+        characters' frequencies: Counter
+        per file characters' frequencies: dict of path to Counter, only when per_file is True
+    """
+    tasks = [task for path in collect_paths(source) for task in split_file(path, split_size)]
+
+    if workers == 1 or len(tasks) <= 1:
+        results = map(count_range, tasks)
+        return merge_histograms(results, per_file)
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(count_range, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+        return merge_histograms(results, per_file)
+
+
+def merge_histograms(results, per_file=False):
+    """ Merge the histograms returned by count_range() into one
+    Args:
+        results: iterable of (path, Counter) tuples
+        per_file: (bool) return a histogram per file as well
+    Returns:
+        characters' frequencies: Counter
+        per file characters' frequencies: dict of path to Counter, only when per_file is True
+    """
+    total = Counter()
+    files = {}
+    for path, histogram in results:
+        total.update(histogram)
+        if per_file:
+            files.setdefault(path, Counter()).update(histogram)
+    return (total, files) if per_file else total
@@ -1,4 +1,27 @@
 ''' This module Reads a file given its path, and counts the frequency of a given letter '''
+import asyncio
+import codecs
+import hashlib
+import io
+import json
+import os
+from collections import Counter
+
+from instrumentation import instrumented
+
+from .character_counter import CharacterCounter, normalize_chunks, normalize_text
+from .pattern_counter import PatternCounter
+
+
+# Number of bytes held in memory at a time by letter_histogram()
+CHUNK_SIZE = 1 << 24
+# The persistent frequency index of a file is saved next to it with this suffix
+INDEX_SUFFIX = '.freq.json'
+# Number of files counted at the same time by aletter_histograms()
+ASYNC_LIMIT = 32
+# Number of leading bytes compared by refresh() to notice a file replaced by another one
+TAIL_HEAD_SIZE = 64
+
 
 class LetterFrequency:
     """ Count a given letter's frequency from a given file path """
@@ -14,25 +37,362 @@ class LetterFrequency:
         """
         self.path = path
         self.data = None
+        self.histogram = None
+        self.index_key = None
+        self.tail_identity = None
+        self.tail_head = b''
+        self.tail_offset = 0
+        self.tail_counter = None
 
 
+    @instrumented(size=lambda args, result: len(args[0].data or ''))
     def read_file(self):
         """ Read file into self.data attribute """
         try:
             with open(self.path, encoding = 'utf-8') as file:
                 self.data = file.read()
+                # The loaded data replaces the in-memory histogram and index
+                self.histogram = None
+                self.index_key = None
 
         except (FileNotFoundError, IOError, OSError) as error:
             print(f"{type(error)}: {error}")
 
 
-    def letter_frequency(self, letter):
+    @instrumented(size=lambda args, result: len(args[0].data or ''))
+    def letter_frequency(self, letter, ignore_case=False, normalization=None):
         """  Count a given letter's frequency
         Args:
             letter: (string)
+            ignore_case: (bool) count upper and lower case letters together
+            normalization: (str) 'NFC', 'NFKC', 'NFD' or 'NFKD' unicode normalization
+                applied to both the letter and the data before counting
         Returns:
             letter's frequency: int
         """
+        if ignore_case or normalization:
+            return self.normalized_frequency(letter, ignore_case, normalization)
+        if self.index_key and len(letter) == 1:
+            return self.build_index()[letter]
+        if self.histogram is not None and len(letter) == 1:
+            return self.histogram[letter]
         if not self.data:
             return 0
         return self.data.count(letter)
+
+
+    def normalized_frequency(self, letter, ignore_case=False, normalization=None):
+        """ Count a letter's frequency after normalizing both the letter and the data.
+        The data, or the file when it isn't loaded, is normalized chunk by chunk,
+        so no second copy of it is made
+        Args:
+            letter: (string)
+            ignore_case: (bool) count upper and lower case letters together
+            normalization: (str) 'NFC', 'NFKC', 'NFD' or 'NFKD'
+        Returns:
+            letter's frequency: int
+        """
+        letter = normalize_text(letter, ignore_case, normalization)
+        if self.data:
+            chunks = (self.data[start:start + CHUNK_SIZE]
+                      for start in range(0, len(self.data), CHUNK_SIZE))
+        elif self.histogram is not None and not normalization and len(letter) == 1:
+            return sum(count for character, count in self.histogram.items()
+                       if character.casefold() == letter)
+        else:
+            # Stream the file when the data isn't loaded, like letter_histogram() does
+            chunks = self.iter_text()
+
+        counter = PatternCounter([letter])
+        try:
+            for text in normalize_chunks(chunks, ignore_case, normalization):
+                counter.feed(text)
+        except (FileNotFoundError, IOError, OSError) as error:
+            print(f"{type(error)}: {error}")
+            return 0
+        return counter.counts()[letter]
+
+
+    def letter_histogram(self, chunk_size=CHUNK_SIZE, ignore_case=False, normalization=None):
+        """ Count the frequency of every character in a single pass over the file,
+        reading chunk_size bytes at a time so memory doesn't grow with the file size.
+        Without options, later letter_frequency() calls for single letters are answered from it
+        Args:
+            chunk_size: (int)
+            ignore_case: (bool) count upper and lower case letters together
+            normalization: (str) 'NFC', 'NFKC', 'NFD' or 'NFKD' unicode normalization
+        Returns:
+            characters' frequencies: Counter
+        """
+        try:
+            if ignore_case or normalization:
+                histogram = Counter()
+                for text in normalize_chunks(self.iter_text(chunk_size), ignore_case,
+                                             normalization):
+                    histogram.update(text)
+                return histogram
+
+            histogram, _ = self.scan_file(chunk_size)
+
+        except (FileNotFoundError, IOError, OSError) as error:
+            print(f"{type(error)}: {error}")
+            return Counter()
+
+        self.histogram = histogram
+        return histogram
+
+
+    def refresh(self, chunk_size=CHUNK_SIZE):
+        """ Count only the bytes appended to the file since the last refresh, keeping the
+        running histogram. A utf-8 sequence or a windows line ending split at the end of the
+        file is kept in the counter's decoder until the rest of it is appended. When the file was
+        truncated or replaced (rotated), counting starts over from its beginning
+        Args:
+            chunk_size: (int)
+        Returns:
+            characters' frequencies: Counter
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                stat = os.fstat(file.fileno())
+                identity = (stat.st_dev, stat.st_ino)
+                head = file.read(TAIL_HEAD_SIZE)
+                if self.tail_counter is None or identity != self.tail_identity \
+                        or stat.st_size < self.tail_offset or not head.startswith(self.tail_head):
+                    self.reset_tail(identity)
+                self.tail_head = head
+
+                file.seek(self.tail_offset)
+                while chunk := file.read(chunk_size):
+                    self.tail_offset += len(chunk)
+                    self.tail_counter.feed(chunk)
+
+        except (FileNotFoundError, IOError, OSError) as error:
+            print(f"{type(error)}: {error}")
+            return Counter()
+
+        self.histogram = self.tail_counter.histogram
+        return self.histogram
+
+
+    def reset_tail(self, identity=None):
+        """ Forget the state of refresh(), so the next refresh counts the file from its start
+        Args:
+            identity: (tuple) device and inode of the file being counted
+        """
+        self.tail_identity = identity
+        self.tail_head = b''
+        self.tail_offset = 0
+        self.tail_counter = CharacterCounter()
+
+
+    async def aletter_histogram(self, chunk_size=CHUNK_SIZE, executor=None):
+        """ Run letter_histogram() in an executor without blocking the event loop
+        Args:
+            chunk_size: (int)
+            executor: (concurrent.futures.Executor) the loop's default thread pool by default
+        Returns:
+            characters' frequencies: Counter
+        """
+        loop = asyncio.get_running_loop()
+        # Set the histogram here too, a process executor updates a copy of this object
+        self.histogram = await loop.run_in_executor(executor, self.letter_histogram, chunk_size)
+        return self.histogram
+
+
+    def scan_file(self, chunk_size=CHUNK_SIZE, start=0, end=None):
+        """ Count the file's characters and hash its content in a single pass,
+        ascii chunks are counted as bytes without being decoded
+        Args:
+            chunk_size: (int)
+            start: (int) byte offset to start from, must be on a character boundary
+            end: (int) byte offset to stop at, the end of the file by default
+        Returns:
+            characters' frequencies: Counter
+            content hash: str
+        """
+        counter = CharacterCounter()
+        content_hash = hashlib.blake2b(digest_size=16)
+        for chunk in self.iter_bytes(chunk_size, start, end):
+            content_hash.update(chunk)
+            counter.feed(chunk)
+        return counter.finish(), content_hash.hexdigest()
+
+
+    def iter_bytes(self, chunk_size=CHUNK_SIZE, start=0, end=None):
+        """ Read the file chunk by chunk
+        Args:
+            chunk_size: (int)
+            start: (int) byte offset to start from
+            end: (int) byte offset to stop at, the end of the file by default
+        Yields:
+            chunk: bytes
+        """
+        remaining = float('inf') if end is None else end - start
+        with open(self.path, 'rb') as file:
+            file.seek(start)
+            while remaining > 0 and (chunk := file.read(min(chunk_size, remaining))):
+                remaining -= len(chunk)
+                yield chunk
+
+
+    def iter_text(self, chunk_size=CHUNK_SIZE, start=0, end=None):
+        """ Decode the file chunk by chunk like read_file() does (utf-8, universal newlines)
+        Args:
+            chunk_size: (int)
+            start: (int) byte offset to start from, must be on a character boundary
+            end: (int) byte offset to stop at, the end of the file by default
+        Yields:
+            decoded text: str
+        """
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), True)
+        for chunk in self.iter_bytes(chunk_size, start, end):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+
+    def patterns_frequency(self, patterns, overlapping=False, chunk_size=CHUNK_SIZE,
+                           ignore_case=False, normalization=None):
+        """ Count many patterns (letters, n-grams or words) in a single pass over the file
+        Args:
+            patterns: (iterable) strings to count
+            overlapping: (bool) count overlapping matches, by default matches are counted
+                like letter_frequency() does (non-overlapping, the same as str.count)
+            chunk_size: (int)
+            ignore_case: (bool) count upper and lower case letters together
+            normalization: (str) 'NFC', 'NFKC', 'NFD' or 'NFKD' unicode normalization
+                applied to both the patterns and the file
+        Returns:
+            patterns' frequencies: dict
+        """
+        patterns = {pattern: normalize_text(pattern, ignore_case, normalization)
+                    for pattern in patterns}
+        counter = PatternCounter(patterns.values(), overlapping)
+        try:
+            for text in normalize_chunks(self.iter_text(chunk_size), ignore_case, normalization):
+                counter.feed(text)
+
+        except (FileNotFoundError, IOError, OSError) as error:
+            print(f"{type(error)}: {error}")
+            return dict.fromkeys(patterns, 0)
+
+        counts = counter.counts()
+        return {pattern: counts[normalized] for pattern, normalized in patterns.items()}
+
+
+    def index_path(self):
+        """ Return the path of the sidecar file holding the persistent frequency index
+        Returns:
+            index path: str
+        """
+        return os.fspath(self.path) + INDEX_SUFFIX
+
+
+    def build_index(self, chunk_size=CHUNK_SIZE):
+        """ Load the frequency index of the file, scanning the file only when it changed.
+        The index is saved to a sidecar file keyed by path, size, mtime and content hash,
+        so it is reused across process restarts. Later letter_frequency() calls for single
+        letters are answered in O(1) and the index is rebuilt when the file changes
+        Args:
+            chunk_size: (int)
+        Returns:
+            characters' frequencies: Counter
+        """
+        try:
+            stat = os.stat(self.path)
+            file_key = {'path': os.path.abspath(self.path), 'size': stat.st_size,
+                        'mtime_ns': stat.st_mtime_ns}
+            if self.index_key and self.histogram is not None \
+                    and file_key.items() <= self.index_key.items():
+                return self.histogram
+
+            index = self.load_index()
+            if index and file_key.items() <= index.items():
+                self.histogram, self.index_key = Counter(index['histogram']), index
+                return self.histogram
+
+            histogram, content_hash = self.scan_file(chunk_size)
+
+        except (FileNotFoundError, IOError, OSError) as error:
+            print(f"{type(error)}: {error}")
+            self.index_key = None
+            return Counter()
+
+        if index and index['hash'] == content_hash:
+            # Only the mtime changed (e.g. the file was touched or copied)
+            histogram = Counter(index['histogram'])
+        self.histogram, self.index_key = histogram, {**file_key, 'hash': content_hash}
+        self.save_index()
+        return histogram
+
+
+    def load_index(self):
+        """ Read the sidecar index file
+        Returns:
+            index: dict, or None when it is missing or unreadable
+        """
+        try:
+            with open(self.index_path(), encoding = 'utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+
+    def save_index(self):
+        """ Write the in-memory index into the sidecar index file """
+        try:
+            with open(self.index_path(), 'w', encoding = 'utf-8') as file:
+                json.dump({**self.index_key, 'histogram': self.histogram}, file)
+
+        except (IOError, OSError) as error:
+            print(f"{type(error)}: {error}")
+
+
+async def aletter_histograms(paths, limit=ASYNC_LIMIT, chunk_size=CHUNK_SIZE, executor=None):
+    """ Count every character of many files, at most limit files at a time,
+    yielding each file's histogram as soon as it is counted. Files that can't be decoded
+    get an empty histogram, like letter_histogram() gives to files that can't be read
+    Args:
+        paths: (iterable) file paths
+        limit: (int) number of files read at the same time
+        chunk_size: (int)
+        executor: (concurrent.futures.Executor) the loop's default thread pool by default
+    Yields:
+        path: str
+        characters' frequencies: Counter
+    """
+    paths = iter(paths)
+    results = asyncio.Queue(maxsize=limit)
+    done = object()
+
+    async def count_files():
+        try:
+            for path in paths:
+                # A file that isn't utf-8 gets an empty histogram, the other files go on
+                try:
+                    histogram = await LetterFrequency(path).aletter_histogram(chunk_size,
+                                                                              executor)
+                except UnicodeDecodeError as error:
+                    print(f"{type(error)}: {error}")
+                    histogram = Counter()
+                await results.put((path, histogram))
+        except Exception as error:  # pylint: disable=broad-except
+            await results.put(error)
+        else:
+            await results.put(done)
+
+    workers = [asyncio.create_task(count_files()) for _ in range(limit)]
+    try:
+        running = len(workers)
+        while running:
+            result = await results.get()
+            if result is done:
+                running -= 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,102 @@
+''' This module counts many patterns in a single pass using an Aho-Corasick automaton '''
+from collections import Counter, deque
+
+
+class PatternCounter:
+    """ Count the frequency of many patterns over text fed in chunks """
+
+    def __init__(self, patterns, overlapping=False):
+        """
+        Construct the Aho-Corasick automaton of the given patterns.
+
+        Parameters
+        ----------
+            patterns : iterable
+                the strings to be counted
+            overlapping : bool
+                count overlapping matches, by default each pattern is counted
+                like str.count() does (non-overlapping, leftmost first)
+        """
+        self.patterns = list(dict.fromkeys(patterns))
+        self.overlapping = overlapping
+        self.single_letters = all(len(pattern) == 1 for pattern in self.patterns)
+        self.histogram = Counter()
+        self.position = 0
+        self.state = 0
+        self.matches = [0] * len(self.patterns)
+        # End position of the last counted match of each pattern, for non-overlapping counts
+        self.last_end = [0] * len(self.patterns)
+        self.build_automaton()
+
+
+    def build_automaton(self):
+        """ Build the goto, failure and output tables of the automaton """
+        self.goto = [{}]
+        self.outputs = [[]]
+        for pattern_index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for letter in pattern:
+                if letter not in self.goto[state]:
+                    self.goto[state][letter] = len(self.goto)
+                    self.goto.append({})
+                    self.outputs.append([])
+                state = self.goto[state][letter]
+            self.outputs[state].append(pattern_index)
+
+        # Breadth first, so each state's failure state is complete before its children
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for letter, child in self.goto[state].items():
+                queue.append(child)
+                fail = self.fail[state]
+                while fail and letter not in self.goto[fail]:
+                    fail = self.fail[fail]
+                if state:
+                    self.fail[child] = self.goto[fail].get(letter, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+
+    def feed(self, text):
+        """ Count the patterns in the next chunk of text, matches spanning chunks are found
+        Args:
+            text: (str)
+        """
+        if self.single_letters:
+            self.histogram.update(text)
+            self.position += len(text)
+            return
+
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        lengths = [len(pattern) for pattern in self.patterns]
+        matches, last_end, overlapping = self.matches, self.last_end, self.overlapping
+        state = self.state
+        for position, letter in enumerate(text, self.position + 1):
+            while state and letter not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(letter, 0)
+            for pattern_index in outputs[state]:
+                if overlapping:
+                    matches[pattern_index] += 1
+                elif position - lengths[pattern_index] >= last_end[pattern_index]:
+                    matches[pattern_index] += 1
+                    last_end[pattern_index] = position
+        self.state = state
+        self.position += len(text)
+
+
+    def counts(self):
+        """ Return the frequency of every pattern in the text fed so far
+        Returns:
+            patterns' frequencies: dict
+        """
+        if self.single_letters:
+            return {pattern: self.histogram[pattern] for pattern in self.patterns}
+        counts = dict(zip(self.patterns, self.matches))
+        if '' in counts:
+            # The same as str.count(''): one empty match around every character
+            counts[''] = self.position + 1
+        return counts
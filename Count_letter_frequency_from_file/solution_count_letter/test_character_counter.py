@@ -0,0 +1,50 @@
+""" Test funcitonality of CharacterCounter class and normalization helpers """
+import io
+import random
+from collections import Counter
+
+import pytest
+from . import character_counter
+from .character_counter import CharacterCounter, normalize_chunks
+
+
+def decoded_histogram(data):
+    """ Count the characters of data decoded like read_file() does
+    Returns:
+        Counter: characters' frequencies
+    """
+    return Counter(io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').read())
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 64])
+def test_character_counter_matches_decoding(monkeypatch, use_numpy, chunk_size):
+    ''' Ensure that counting ascii chunks as bytes gives the same counts as decoding,
+        with windows line endings and utf-8 sequences split across chunks
+    Returns:
+        bool
+    '''
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(character_counter, 'np', None)
+    random.seed(chunk_size)
+    data = ''.join(random.choice(['a', 'B', '\r', '\n', '\r\n', 'ö', '😀', ' '])
+                   for _ in range(500)).encode('utf-8')
+
+    counter = CharacterCounter()
+    for start in range(0, len(data), chunk_size):
+        counter.feed(data[start:start + chunk_size])
+    assert counter.finish() == decoded_histogram(data)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 100])
+def test_normalize_chunks(chunk_size):
+    ''' Ensure that chunked normalization combines marks split from their letter
+    Returns:
+        bool
+    '''
+    text = "Café CAFÉ ﬁne Straße " * 5
+    chunks = (text[start:start + chunk_size] for start in range(0, len(text), chunk_size))
+    normalized = ''.join(normalize_chunks(chunks, ignore_case=True, normalization='NFKC'))
+    assert normalized == "café café fine strasse " * 5
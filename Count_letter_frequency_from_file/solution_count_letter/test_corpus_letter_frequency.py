@@ -0,0 +1,70 @@
+""" Test funcitonality of corpus_histogram() function """
+from collections import Counter
+
+import pytest
+from .corpus_letter_frequency import corpus_histogram, split_file
+from .file_letter_frequency import LetterFrequency
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """ Write a small corpus of files with multi-byte letters and windows line endings
+    Returns:
+        pathlib.Path: corpus directory
+    """
+    (tmp_path / 'nested').mkdir()
+    contents = {'a.txt': "Hello, Wörld!\r\n" * 40, 'b.log': "Lorem ipsum 😀 dolor\r\n" * 30,
+                'nested/c.txt': "ñandú " * 50, 'empty.txt': ""}
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content.encode('utf-8'))
+    return tmp_path
+
+
+def expected_histogram(paths):
+    """ Count the letters of the given files one by one with LetterFrequency
+    Returns:
+        Counter: characters' frequencies
+    """
+    total = Counter()
+    for path in paths:
+        frequency = LetterFrequency(str(path))
+        frequency.read_file()
+        total.update(frequency.data)
+    return total
+
+
+@pytest.mark.parametrize("workers, split_size", [(1, 1 << 20), (2, 1 << 20), (3, 7), (1, 5)])
+def test_corpus_histogram_directory(corpus, workers, split_size):
+    ''' Ensure that counting a directory with split files matches counting each file whole
+    Returns:
+        bool
+    '''
+    histogram, files = corpus_histogram(corpus, workers, split_size, per_file=True)
+    assert histogram == expected_histogram(corpus.rglob('*.*'))
+    assert set(files) == {str(path) for path in corpus.rglob('*.*')}
+    assert files[str(corpus / 'nested' / 'c.txt')] == Counter("ñandú " * 50)
+
+
+def test_corpus_histogram_glob_and_list(corpus):
+    ''' Ensure that glob patterns and lists of paths select the files to count
+    Returns:
+        bool
+    '''
+    assert corpus_histogram(str(corpus / '*.txt'), workers=1) == \
+        expected_histogram([corpus / 'a.txt'])
+    assert corpus_histogram([corpus / 'b.log'], workers=1) == \
+        expected_histogram([corpus / 'b.log'])
+
+
+def test_split_file_boundaries(corpus):
+    ''' Ensure that byte ranges don't split utf-8 sequences or windows line endings
+    Returns:
+        bool
+    '''
+    path = str(corpus / 'b.log')
+    data = (corpus / 'b.log').read_bytes()
+    ranges = split_file(path, 3)
+    assert ranges[0][1] == 0 and ranges[-1][2] is None
+    for _, start, _ in ranges[1:]:
+        assert data[start] & 0xC0 != 0x80
+        assert data[start - 1:start + 1] != b'\r\n'
@@ -1,9 +1,14 @@
 """ Test funcitonality of letter_frequency() function and time consumption"""
 # Python program to show time by perf_counter()
+import asyncio
+import json
+import os
+from collections import Counter
+from pathlib import Path
 from time import perf_counter
 
 import pytest
-from .file_letter_frequency import LetterFrequency
+from .file_letter_frequency import INDEX_SUFFIX, LetterFrequency, aletter_histograms
 
 
 VALID_TIME_CONSUMPTION = 1
@@ -37,3 +42,252 @@ def test_letter_frequency(expected_letter_frequency, letter, valid_time_consumpt
 
     assert letter_frequency_result == expected_letter_frequency
     assert resulted_time_consumption <= valid_time_consumption
+
+
+@pytest.fixture
+def small_file(tmp_path):
+    """ Write a small file with non-ascii letters and windows line endings
+    Returns:
+        str: file path
+    """
+    path = tmp_path / 'small.txt'
+    path.write_bytes("Hello, Wörld!\r\nLorem ipsum 😀 dolor\r\n".encode('utf-8') * 50)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_letter_histogram(small_file, chunk_size):
+    ''' Ensure that letter_histogram counts every character like reading the whole file does
+    Returns:
+        bool
+    '''
+    whole_file = LetterFrequency(small_file)
+    whole_file.read_file()
+    histogram = LetterFrequency(small_file).letter_histogram(chunk_size)
+
+    assert sum(histogram.values()) == len(whole_file.data)
+    for letter in set(whole_file.data) | {'\r', 'z'}:
+        assert histogram[letter] == whole_file.letter_frequency(letter)
+
+
+def test_letter_frequency_from_histogram(small_file):
+    ''' Ensure that letter_frequency answers from the histogram once it is built
+    Returns:
+        bool
+    '''
+    frequency = LetterFrequency(small_file)
+    frequency.letter_histogram()
+    assert frequency.data is None
+    assert frequency.letter_frequency('o') == 200
+    assert frequency.letter_frequency('ö') == 50
+
+
+def test_letter_histogram_missing_file(tmp_path):
+    ''' Ensure that a missing file gives an empty histogram
+    Returns:
+        bool
+    '''
+    assert not LetterFrequency(str(tmp_path / 'missing.txt')).letter_histogram()
+
+
+def test_build_index_is_reused(small_file, monkeypatch):
+    ''' Ensure that the saved index is reused by a new object without reading the file again
+    Returns:
+        bool
+    '''
+    histogram = LetterFrequency(small_file).build_index()
+    assert os.path.exists(small_file + INDEX_SUFFIX)
+
+    def fail_scan(*args):
+        raise AssertionError("file should not be scanned again")
+    monkeypatch.setattr(LetterFrequency, 'scan_file', fail_scan)
+    frequency = LetterFrequency(small_file)
+    assert frequency.build_index() == histogram
+    assert frequency.letter_frequency('o') == 200
+
+
+def test_build_index_rebuilt_on_change(small_file):
+    ''' Ensure that the index is rebuilt when the file content changes
+    Returns:
+        bool
+    '''
+    frequency = LetterFrequency(small_file)
+    assert frequency.letter_frequency('z') == 0
+    frequency.build_index()
+    with open(small_file, 'a', encoding='utf-8') as file:
+        file.write('zz')
+    os.utime(small_file, ns=(0, 10 ** 18))
+    assert frequency.letter_frequency('z') == 2
+    assert LetterFrequency(small_file).build_index()['z'] == 2
+
+
+def test_read_file_after_build_index(small_file):
+    ''' Ensure that read_file() after build_index() answers from the loaded data
+    and that the index can be built again afterwards
+    Returns:
+        bool
+    '''
+    counter = LetterFrequency(small_file)
+    counter.build_index()
+    counter.read_file()
+    assert counter.letter_frequency('l') == counter.data.count('l')
+    assert counter.build_index()['l'] == counter.data.count('l')
+    assert counter.letter_frequency('l') == counter.data.count('l')
+
+
+def test_normalized_frequency_without_data(tmp_path):
+    ''' Ensure that normalized counts stream the file when only a histogram or an index exists
+    Returns:
+        bool
+    '''
+    path = tmp_path / 'accents.txt'
+    path.write_text("cafe\u0301 Straße STRASSE\n" * 3, encoding='utf-8')
+    counter = LetterFrequency(str(path))
+    counter.letter_histogram()
+    assert counter.letter_frequency('é', normalization='NFC') == 3
+    assert counter.letter_frequency('ß', ignore_case=True) == 6
+    counter = LetterFrequency(str(path))
+    counter.build_index()
+    assert counter.letter_frequency('é', normalization='NFC') == 3
+    assert counter.letter_frequency('ß', ignore_case=True) == 6
+
+
+def test_build_index_touched_file(small_file, monkeypatch):
+    ''' Ensure that a file with a new mtime but the same content keeps its index
+    Returns:
+        bool
+    '''
+    LetterFrequency(small_file).build_index()
+    os.utime(small_file, ns=(0, 10 ** 18))
+    monkeypatch.setattr(LetterFrequency, 'load_index', lambda self: {
+        **json.loads(Path(self.index_path()).read_text(encoding='utf-8')), 'histogram': {'o': 1}})
+    assert LetterFrequency(small_file).build_index()['o'] == 1
+
+
+def test_patterns_frequency(small_file):
+    ''' Ensure that patterns_frequency counts every pattern like letter_frequency does
+    Returns:
+        bool
+    '''
+    patterns = ['o', 'lo', 'ö', 'or', 'ld!\n', '😀 d', 'absent']
+    frequency = LetterFrequency(small_file)
+    frequency.read_file()
+    assert frequency.patterns_frequency(patterns, chunk_size=5) == \
+        {pattern: frequency.letter_frequency(pattern) for pattern in patterns}
+
+
+def test_aletter_histogram(small_file):
+    ''' Ensure that aletter_histogram counts like letter_histogram does
+    Returns:
+        bool
+    '''
+    frequency = LetterFrequency(small_file)
+    histogram = asyncio.run(frequency.aletter_histogram(chunk_size=9))
+    assert histogram == LetterFrequency(small_file).letter_histogram()
+    assert frequency.letter_frequency('ö') == 50
+
+
+@pytest.mark.parametrize("limit", [1, 3, 100])
+def test_aletter_histograms(tmp_path, limit):
+    ''' Ensure that every file is counted once with a bounded number of files at a time
+    Returns:
+        bool
+    '''
+    paths = []
+    for index in range(10):
+        path = tmp_path / f'{index}.txt'
+        path.write_text('a' * index, encoding='utf-8')
+        paths.append(str(path))
+
+    async def collect():
+        return {path: histogram async for path, histogram in aletter_histograms(paths, limit)}
+
+    histograms = asyncio.run(collect())
+    assert {path: histogram['a'] for path, histogram in histograms.items()} == \
+        {path: index for index, path in enumerate(paths)}
+
+
+def test_aletter_histograms_bad_file(tmp_path, capsys):
+    ''' Ensure that a file that isn't utf-8 is reported without stopping the other files
+    Returns:
+        bool
+    '''
+    paths = []
+    for index in range(5):
+        path = tmp_path / f'{index}.txt'
+        path.write_bytes(b'\xff\xfe bad' if index == 2 else b'b' * index)
+        paths.append(str(path))
+
+    async def collect():
+        return {path: histogram async for path, histogram in aletter_histograms(paths, 2)}
+
+    histograms = asyncio.run(collect())
+    assert {path: histogram['b'] for path, histogram in histograms.items()} == \
+        {path: 0 if index == 2 else index for index, path in enumerate(paths)}
+    assert histograms[paths[2]] == Counter()
+    assert 'UnicodeDecodeError' in capsys.readouterr().out
+
+
+def test_refresh_counts_appended_bytes(tmp_path):
+    ''' Ensure that refresh counts only appended bytes, including sequences split at the end
+    Returns:
+        bool
+    '''
+    path = tmp_path / 'growing.log'
+    appended = ["Hello\r", "\nWörld ", "😀"]
+    encoded = b''.join(part.encode('utf-8') for part in appended)
+    frequency = LetterFrequency(str(path))
+    path.write_bytes(b'')
+    assert not frequency.refresh()
+
+    # Append one byte at a time, splitting the utf-8 sequences and the windows line ending
+    for index in range(len(encoded)):
+        with open(path, 'ab') as file:
+            file.write(encoded[index:index + 1])
+        frequency.refresh()
+        assert frequency.tail_offset == index + 1
+
+    assert frequency.histogram == Counter("Hello\nWörld 😀")
+    assert frequency.letter_frequency('ö') == 1
+
+
+def test_refresh_truncated_or_rotated(tmp_path):
+    ''' Ensure that refresh starts over when the file is truncated or replaced
+    Returns:
+        bool
+    '''
+    path = tmp_path / 'rotating.log'
+    path.write_text('aaaa', encoding='utf-8')
+    frequency = LetterFrequency(str(path))
+    assert frequency.refresh()['a'] == 4
+
+    path.write_text('bb', encoding='utf-8')
+    assert frequency.refresh() == Counter('bb')
+
+    rotated = tmp_path / 'new.log'
+    rotated.write_text('cccccc', encoding='utf-8')
+    os.replace(rotated, path)
+    assert frequency.refresh() == Counter('cccccc')
+
+
+def test_letter_frequency_ignore_case_and_normalization(tmp_path):
+    ''' Ensure that case-insensitive and normalized counting work on the data and the file
+    Returns:
+        bool
+    '''
+    path = tmp_path / 'accents.txt'
+    path.write_text("Café CAFÉ café\n" * 10, encoding='utf-8')
+    frequency = LetterFrequency(str(path))
+    frequency.read_file()
+
+    assert frequency.letter_frequency('é') == 10
+    assert frequency.letter_frequency('é', normalization='NFC') == 20
+    assert frequency.letter_frequency('É', ignore_case=True, normalization='NFC') == 30
+    assert frequency.letter_frequency('c', ignore_case=True) == 30
+    assert frequency.letter_histogram(4, ignore_case=True, normalization='NFC')['é'] == 30
+    assert frequency.patterns_frequency(['CAFÉ', 'é'], chunk_size=3, ignore_case=True,
+                                        normalization='NFC') == {'CAFÉ': 30, 'é': 30}
+
+    frequency = LetterFrequency(str(path))
+    frequency.letter_histogram()
+    assert frequency.letter_frequency('C', ignore_case=True) == 30
@@ -0,0 +1,46 @@
+""" Test funcitonality of PatternCounter class """
+import random
+import re
+
+import pytest
+from .pattern_counter import PatternCounter
+
+
+def overlapping_count(text, pattern):
+    """ Count overlapping matches of pattern in text with a lookahead regex
+    Returns:
+        int: matches
+    """
+    return len(re.findall(f'(?=({re.escape(pattern)}))', text))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_pattern_counter_matches_str_count(chunk_size):
+    ''' Ensure that non-overlapping and overlapping counts match str.count and a regex
+        even when matches span chunks
+    Returns:
+        bool
+    '''
+    random.seed(7)
+    text = ''.join(random.choice('aab\nñ') for _ in range(2000))
+    patterns = ['a', 'aa', 'aaa', 'ab', 'ba', 'aba', 'ñ\n', 'b', 'aab\n', 'zz', '']
+
+    for overlapping in (False, True):
+        counter = PatternCounter(patterns, overlapping)
+        for start in range(0, len(text), chunk_size):
+            counter.feed(text[start:start + chunk_size])
+        for pattern, count in counter.counts().items():
+            if overlapping and pattern:
+                assert count == overlapping_count(text, pattern)
+            else:
+                assert count == text.count(pattern)
+
+
+def test_pattern_counter_single_letters():
+    ''' Ensure that a set of single letters is counted with the histogram path
+    Returns:
+        bool
+    '''
+    counter = PatternCounter(['L', 'i', 'L'])
+    counter.feed("Lorem ipsum dolor sit amet, Lili")
+    assert counter.counts() == {'L': 2, 'i': 4}
@@ -0,0 +1,262 @@
+""" Benchmark every encryption and decryption path of Cipher over sizes, keys, data and workloads
+
+Usage (from the repository root):
+    python -m cipher_equation.solution.benchmark_encryption --sizes 1K 1M --save baseline.json
+    python -m cipher_equation.solution.benchmark_encryption --sizes 1K 1M --baseline baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from .encryption import Cipher, np
+
+
+SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+DEFAULT_SIZES = ['1K', '64K', '1M']
+ALL_SIZES = ['1K', '1M', '1G']
+KEYS = {'short': 'ReemaR', 'long': 'yahyaAbbadi ' * 64}
+SAMPLES = {'ascii': "hi, it is me, how are you? are you ok? can you speak?\n",
+           'non-ascii': "مرحبا، كيف حالك؟ Ünïcödé 😀 Привет, как дела?\n"}
+# Length of each message in the many-small-messages workload
+MESSAGE_SIZE = 64
+PARALLEL_WORKERS = 4
+# A case is a regression when it is this many times slower than the baseline
+DEFAULT_THRESHOLD = 1.25
+
+ONE_SHOT_PATHS = {
+    'python': lambda cipher, data: cipher.encrypt(data, backend='python'),
+    'numpy': lambda cipher, data: cipher.encrypt(data, backend='numpy'),
+    'parallel': lambda cipher, data: cipher.encrypt(data, workers=PARALLEL_WORKERS),
+    'stream': lambda cipher, data: cipher.encrypt_stream(io.StringIO(data), io.StringIO()),
+    'bytes-python': lambda cipher, data: cipher.encrypt_to_bytes(data, backend='python'),
+    'bytes-numpy': lambda cipher, data: cipher.encrypt_to_bytes(data, backend='numpy'),
+    'file': lambda cipher, paths: cipher.encrypt_file(*paths),
+    'decrypt-python': lambda cipher, data: cipher.decrypt(data, backend='python'),
+    'decrypt-numpy': lambda cipher, data: cipher.decrypt(data, backend='numpy'),
+    'decrypt-parallel': lambda cipher, data: cipher.decrypt(data, workers=PARALLEL_WORKERS),
+    'decrypt-stream': lambda cipher, data: cipher.decrypt_stream(io.StringIO(data),
+                                                                 io.StringIO()),
+    'decrypt-bytes-python': lambda cipher, buffer: cipher.decrypt_from_bytes(buffer,
+                                                                             backend='python'),
+    'decrypt-bytes-numpy': lambda cipher, buffer: cipher.decrypt_from_bytes(buffer,
+                                                                            backend='numpy'),
+    'decrypt-file': lambda cipher, paths: cipher.decrypt_file(*paths),
+}
+MANY_PATHS = {
+    'loop': lambda cipher, messages: [cipher.encrypt(message) for message in messages],
+    'many-python': lambda cipher, messages: cipher.encrypt_many(messages, backend='python'),
+    'many-numpy': lambda cipher, messages: cipher.encrypt_many(messages, backend='numpy'),
+    'decrypt-loop': lambda cipher, messages: [cipher.decrypt(message) for message in messages],
+    'decrypt-many-python': lambda cipher, messages: cipher.decrypt_many(messages,
+                                                                        backend='python'),
+    'decrypt-many-numpy': lambda cipher, messages: cipher.decrypt_many(messages,
+                                                                       backend='numpy'),
+}
+WORKLOADS = {'one-shot': ONE_SHOT_PATHS, 'many': MANY_PATHS}
+NUMPY_PATHS = {'numpy', 'bytes-numpy', 'many-numpy', 'decrypt-numpy', 'decrypt-bytes-numpy',
+               'decrypt-many-numpy'}
+
+
+def write_file(directory, name, data):
+    """ Write data into a utf-8 file the way encrypt_file() writes its output
+    Args:
+        directory (str): directory of the file
+        name (str): file name
+        data (str): file content
+    Returns:
+        str: file path
+    """
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8', errors='surrogatepass', newline='') as file:
+        file.write(data)
+    return path
+
+
+# Inputs of the paths that don't take the data or the messages themselves, built once
+# before timing: function taking the cipher, the data or messages and a temporary directory
+PATH_INPUTS = {
+    'file': lambda cipher, data, directory: (write_file(directory, 'data.txt', data),
+                                             os.path.join(directory, 'encrypted.txt')),
+    'decrypt-file': lambda cipher, data, directory: (
+        write_file(directory, 'encrypted.txt', cipher.encrypt(data)),
+        os.path.join(directory, 'decrypted.txt')),
+    **dict.fromkeys(['decrypt-python', 'decrypt-numpy', 'decrypt-parallel', 'decrypt-stream'],
+                    lambda cipher, data, directory: cipher.encrypt(data)),
+    **dict.fromkeys(['decrypt-bytes-python', 'decrypt-bytes-numpy'],
+                    lambda cipher, data, directory: cipher.encrypt_to_bytes(data)),
+    **dict.fromkeys(['decrypt-loop', 'decrypt-many-python', 'decrypt-many-numpy'],
+                    lambda cipher, messages, directory: cipher.encrypt_many(messages)),
+}
+
+
+def parse_size(size):
+    """ Convert a human readable size like 64K into a number of characters
+    Args:
+        size (str): a number followed by an optional K, M or G unit
+    Returns:
+        int: number of characters
+    """
+    size = size.strip().upper()
+    if size[-1:] in SIZE_UNITS:
+        return int(size[:-1]) * SIZE_UNITS[size[-1]]
+    return int(size)
+
+
+def make_data(size, kind):
+    """ Build benchmark data of the given number of characters
+    Args:
+        size (int): number of characters
+        kind (str): a SAMPLES key
+    Returns:
+        str: data
+    """
+    sample = SAMPLES[kind]
+    return (sample * (size // len(sample) + 1))[:size]
+
+
+def split_messages(data):
+    """ Split data into MESSAGE_SIZE messages for the many-small-messages workload
+    Args:
+        data (str)
+    Returns:
+        list: messages
+    """
+    return [data[start:start + MESSAGE_SIZE] for start in range(0, len(data), MESSAGE_SIZE)]
+
+
+def best_time(function, repeat):
+    """ Run function repeat times and return the fastest run
+    Args:
+        function (callable): function without arguments
+        repeat (int): number of runs
+    Returns:
+        float: seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmarks(sizes, keys=tuple(KEYS), kinds=tuple(SAMPLES), workloads=tuple(WORKLOADS),
+                   paths=None, repeat=3):
+    """ Time every selected execution path for every selected case
+    Args:
+        sizes (list): sizes like '1K' or '1M'
+        keys (tuple): KEYS names
+        kinds (tuple): SAMPLES names
+        workloads (tuple): WORKLOADS names
+        paths (set, optional): path names to run, all available paths by default
+        repeat (int): number of runs per case, the fastest one is kept
+    Returns:
+        dict: case name -> {'seconds': float, 'size': int}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size_name in sizes:
+            size = parse_size(size_name)
+            for kind in kinds:
+                data = make_data(size, kind)
+                messages = split_messages(data)
+                for key_name in keys:
+                    cipher = Cipher(KEYS[key_name])
+                    for workload in workloads:
+                        for path, function in WORKLOADS[workload].items():
+                            if paths and path not in paths \
+                                    or path in NUMPY_PATHS and np is None:
+                                continue
+                            payload = data if workload == 'one-shot' else messages
+                            if path in PATH_INPUTS:
+                                payload = PATH_INPUTS[path](cipher, payload, directory)
+                            name = f'{workload}/{path}/{size_name}/{key_name}/{kind}'
+                            seconds = best_time(
+                                lambda function=function, payload=payload:
+                                function(cipher, payload), repeat)
+                            results[name] = {'seconds': seconds, 'size': size}
+    return results
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """ Compare results with a baseline run of the same cases
+    Args:
+        results (dict): run_benchmarks() output
+        baseline (dict): a previous run_benchmarks() output
+        threshold (float): allowed slowdown ratio
+    Returns:
+        dict: case name -> slowdown ratio, for the cases slower than threshold
+    """
+    regressions = {}
+    for name, result in results.items():
+        if name in baseline and baseline[name]['seconds'] > 0:
+            ratio = result['seconds'] / baseline[name]['seconds']
+            if ratio > threshold:
+                regressions[name] = ratio
+    return regressions
+
+
+def format_report(results, baseline=None):
+    """ Format results as a table, with the ratio to the baseline when given
+    Args:
+        results (dict): run_benchmarks() output
+        baseline (dict, optional): a previous run_benchmarks() output
+    Returns:
+        str: report
+    """
+    lines = [f"{'case':<52} {'seconds':>12} {'MB/s':>10} {'vs base':>8}"]
+    for name, result in results.items():
+        throughput = result['size'] / result['seconds'] / (1 << 20) if result['seconds'] else 0
+        ratio = ''
+        if baseline and name in baseline and baseline[name]['seconds']:
+            ratio = f"{result['seconds'] / baseline[name]['seconds']:.2f}x"
+        lines.append(f"{name:<52} {result['seconds']:>12.6f} {throughput:>10.1f} {ratio:>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """ Run the benchmarks from the command line
+    Args:
+        argv (list, optional): command line arguments
+    Returns:
+        int: exit code, 1 when a regression is found
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        help=f"payload sizes, e.g. {' '.join(ALL_SIZES)}")
+    parser.add_argument('--keys', nargs='+', default=list(KEYS), choices=list(KEYS))
+    parser.add_argument('--data', nargs='+', default=list(SAMPLES), choices=list(SAMPLES))
+    parser.add_argument('--workloads', nargs='+', default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument('--paths', nargs='+',
+                        choices=[*ONE_SHOT_PATHS, *MANY_PATHS], help="execution paths to run")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help="write the results as json to this file")
+    parser.add_argument('--baseline', help="compare with results saved by --save")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.keys, args.data, args.workloads,
+                             set(args.paths or ()), args.repeat)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+    print(format_report(results, baseline))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if baseline and (regressions := find_regressions(results, baseline, args.threshold)):
+        for name, ratio in regressions.items():
+            print(f"REGRESSION {name}: took {ratio:.2f}x the baseline time")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
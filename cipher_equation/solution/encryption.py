@@ -1,5 +1,32 @@
 """ this module is a cipher implementation of both encryption and decryption"""
 import numbers
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import accumulate, repeat
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from instrumentation import instrumented
+
+
+# Data shorter than this is handled faster by the pure python loop than by numpy
+NUMPY_MIN_LENGTH = 256
+MAX_CODE_POINT = 0x10FFFF
+BACKENDS = ('auto', 'python', 'numpy')
+# Number of characters held in memory at a time by the streaming methods
+DEFAULT_CHUNK_SIZE = 1 << 20
+# Binary cipher header: magic bytes followed by one byte holding the code point width,
+# 4 bytes in total so a uint32 payload stays aligned
+BYTES_MAGIC = b'CPH'
+BYTES_HEADER_SIZE = 4
+WIDTH_TYPECODES = {2: 'H', 4: 'I'}
+# Number of Cipher instances kept by get_cipher()
+CIPHER_CACHE_SIZE = 4096
 
 class Cipher:
     """ Encrypt and decrypt a given string data"""
@@ -14,11 +41,15 @@ class Cipher:
                 A string that will be used symmetrically in encryption and decryption,
                 by applying an equation to it with the given data
         """
-        self.key = key
+        self.set_key(key)
 
     def set_key(self, key):
-        """ Add key instance variable """
+        """ Add key instance variable and compute its doubled key schedule once,
+        so encrypt() and decrypt() don't convert the key on every call
+        """
         self.key = key
+        self.key_schedule = [element << 1 for element in self.check_user_input(key)]
+        self.numpy_schedule = np.array(self.key_schedule, dtype=np.int64) if np else None
 
     def get_key(self):
         """ Retrieve key instance variable """
@@ -52,45 +83,449 @@ class Cipher:
         return 0
 
 
-    def encrypt(self, data):
-        """ Convert data into a cipher
+    def use_numpy(self, data, backend):
+        """ Decide whether data should be handled by the vectorized numpy backend
         Args:
-            data (string): the real data needed to be encrypted
+            data (string | memoryview): the data needed to be encrypted or decrypted
+            backend (string): one of BACKENDS
         Returns:
-            str: Encrypted data
+            bool: True when the numpy backend should be used
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend {backend} is not valid, choose one of {BACKENDS}")
+        if backend == 'python' or not isinstance(data, (str, memoryview)):
+            return False
+        if np is None:
+            if backend == 'numpy':
+                raise ImportError("numpy backend requires numpy to be installed")
+            return False
+        return backend == 'numpy' or len(data) >= NUMPY_MIN_LENGTH
 
-        # Convert each character into a decimal number
-        key2 = self.check_user_input(self.key)
-        data = self.check_user_input(data)
 
-        encrypted = ""
+    def shift_numpy(self, data, sign, offset=0):
+        """ Add (or subtract) the doubled key schedule to data in a single array operation
+        Args:
+            data (string): the data needed to be shifted
+            sign (int): 1 to encrypt, -1 to decrypt
+            offset (int): position of data's first character in the whole message
+        Returns:
+            str: shifted data
+        """
+        if not data:
+            return ""
+
+        codes = code_points(data)
+        # key index cycles as data index % key length, the same as get_key_index()
+        schedule = np.roll(self.numpy_schedule, -(offset % len(self.key_schedule)))
+        return from_code_points(codes + sign * np.resize(schedule, codes.size))
 
-        key_index = 0
-        for index_data, element_data in enumerate(data):
+
+    def shift_codes_python(self, data, sign, offset=0):
+        """ Add (or subtract) the doubled key schedule to data one character at a time
+        Args:
+            data (list): decimal numbers of the data needed to be shifted
+            sign (int): 1 to encrypt, -1 to decrypt
+            offset (int): position of data's first character in the whole message
+        Returns:
+            list: shifted decimal numbers
+        """
+        if not data:
+            return []
+
+        key_schedule = self.key_schedule
+        shifted = []
+
+        key_index = offset % len(key_schedule) - 1
+        for index_data, element_data in enumerate(data, offset):
             key_index = self.get_key_index(index_data, key_index)
-            encrypted += (chr( (key2[key_index] << 1) + element_data ))
+            shifted.append(element_data + sign * key_schedule[key_index])
 
-        return encrypted
+        return shifted
 
 
-    def decrypt(self, encrypted_data):
+    def shift_python(self, data, sign, offset=0):
+        """ Shift data one character at a time and convert it back into a string
+        Args:
+            data (list): decimal numbers of the data needed to be shifted
+            sign (int): 1 to encrypt, -1 to decrypt
+            offset (int): position of data's first character in the whole message
+        Returns:
+            str: shifted data
+        """
+        return "".join(map(chr, self.shift_codes_python(data, sign, offset)))
+
+
+    def shift(self, data, sign, backend='auto', offset=0, workers=None):
+        """ Shift data by the key using the chosen backend
+        Args:
+            data (string): the data needed to be shifted
+            sign (int): 1 to encrypt, -1 to decrypt
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large data
+            offset (int): position of data's first character in the whole message
+            workers (int, optional): number of processes to split the data across
+        Returns:
+            str: shifted data
+        """
+        if workers and workers > 1 and isinstance(data, str) and len(data) > 1:
+            return self.shift_parallel(data, sign, backend, offset, workers)
+
+        if self.use_numpy(data, backend):
+            return self.shift_numpy(data, sign, offset)
+        # Convert each character into a decimal number
+        return self.shift_python(self.check_user_input(data), sign, offset)
+
+
+    def shift_many(self, messages, sign, backend='auto'):
+        """ Shift every message on its own, reusing the key schedule for all of them.
+        With numpy, all messages are shifted together in a single array operation
+        Args:
+            messages (iterable): strings needed to be shifted
+            sign (int): 1 to encrypt, -1 to decrypt
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large batches
+        Returns:
+            list: shifted messages
+        """
+        messages = list(messages)
+        joined = "".join(messages) if all(isinstance(message, str) for message in messages) \
+            else None
+        if not joined or not self.use_numpy(joined, backend):
+            return [self.shift(message, sign, backend) for message in messages]
+
+        if not self.key_schedule:
+            raise ZeroDivisionError("integer modulo by zero")
+
+        # Every message starts again from the first key index
+        lengths = np.fromiter(map(len, messages), dtype=np.int64, count=len(messages))
+        ends = np.cumsum(lengths)
+        positions = np.arange(ends[-1]) - np.repeat(ends - lengths, lengths)
+        shifts = self.numpy_schedule[positions % len(self.key_schedule)]
+        shifted = from_code_points(code_points(joined) + sign * shifts)
+
+        bounds = [0, *ends.tolist()]
+        return [shifted[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+    def shift_parallel(self, data, sign, backend, offset, workers):
+        """ Split data into ranges aligned to the key length and shift them in a process pool
+        Args:
+            data (string): the data needed to be shifted
+            sign (int): 1 to encrypt, -1 to decrypt
+            backend (string): 'python', 'numpy' or 'auto', used by every worker
+            offset (int): position of data's first character in the whole message
+            workers (int): number of processes
+        Returns:
+            str: shifted data
+        """
+        key_length = len(self.key_schedule)
+        if not key_length:
+            raise ZeroDivisionError("integer modulo by zero")
+
+        # Every range starts on a multiple of the key length, so all share the same offset
+        range_size = -(-len(data) // workers)
+        range_size += -range_size % key_length
+        ranges = [data[start:start + range_size] for start in range(0, len(data), range_size)]
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+            return "".join(executor.map(shift_chunk, repeat(self.key), ranges, repeat(sign),
+                                        repeat(backend), repeat(offset)))
+
+
+    @instrumented(size=lambda args, result: len(result))
+    def encrypt(self, data, backend='auto', workers=None):
+        """ Convert data into a cipher
+        Args:
+            data (string): the real data needed to be encrypted
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large data
+            workers (int, optional): number of processes to split the data across
+        Returns:
+            str: Encrypted data
+        """
+        return self.shift(data, 1, backend, workers=workers)
+
+
+    @instrumented(size=lambda args, result: len(result))
+    def decrypt(self, encrypted_data, backend='auto', workers=None):
         """ Decode encrypted data into a human readable intelligible data
         Args:
             encrypted_data (string): the encrypted data needed to be decoded
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large data
+            workers (int, optional): number of processes to split the data across
         Returns:
             str: Decrypted data
         """
+        return self.shift(encrypted_data, -1, backend, workers=workers)
 
-        # Convert each character into a decimal number
-        key2 = self.check_user_input(self.key)
-        encrypted_data = self.check_user_input(encrypted_data)
 
-        decrypted = ""
+    def encrypt_many(self, messages, backend='auto'):
+        """ Encrypt a list of messages with one key schedule
+        Args:
+            messages (list): real data strings needed to be encrypted
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large batches
+        Returns:
+            list: Encrypted messages, in the same order
+        """
+        return self.shift_many(messages, 1, backend)
+
+
+    def decrypt_many(self, encrypted_messages, backend='auto'):
+        """ Decrypt a list of messages with one key schedule
+        Args:
+            encrypted_messages (list): encrypted strings needed to be decoded
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large batches
+        Returns:
+            list: Decrypted messages, in the same order
+        """
+        return self.shift_many(encrypted_messages, -1, backend)
+
+
+    def encrypt_to_bytes(self, data, backend='auto'):
+        """ Convert data into a compact binary cipher: a BYTES_HEADER_SIZE header followed
+        by one little-endian uint16 (or uint32 when needed) per encrypted character
+        Args:
+            data (string): the real data needed to be encrypted
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large data
+        Raises:
+            ZeroDivisionError: when the key is empty
+        Returns:
+            memoryview: Encrypted data, ready to be written to files and sockets without copies
+        """
+        if self.use_numpy(data, backend) and data:
+            # np.resize() of an empty key schedule gives zeros instead of failing
+            if not self.key_schedule:
+                raise ZeroDivisionError("integer modulo by zero")
+            codes = code_points(data)
+            codes += np.resize(self.numpy_schedule, codes.size)
+            width = code_width(int(codes.max()))
+            # Allocated once, the codes are written into it in place
+            buffer = bytearray(BYTES_HEADER_SIZE + codes.size * width)
+            buffer[:BYTES_HEADER_SIZE] = bytes_header(width)
+            np.frombuffer(buffer, dtype=f'<u{width}', offset=BYTES_HEADER_SIZE)[:] = codes
+            return memoryview(buffer)
+
+        codes = array('I', self.shift_codes_python(self.check_user_input(data), 1))
+        width = code_width(max(codes, default=0))
+        if width != codes.itemsize:
+            codes = array(WIDTH_TYPECODES[width], codes)
+        if sys.byteorder == 'big':
+            codes.byteswap()
+        buffer = bytearray(bytes_header(width))
+        buffer += codes
+        return memoryview(buffer)
+
+
+    def decrypt_from_bytes(self, buffer, backend='auto'):
+        """ Decode a binary cipher created by encrypt_to_bytes()
+        Args:
+            buffer (bytes-like): any buffer protocol object, it is read without copying
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large data
+        Raises:
+            ValueError: when buffer doesn't start with a valid header
+            ZeroDivisionError: when the key is empty
+        Returns:
+            str: Decrypted data
+        """
+        buffer = memoryview(buffer).cast('B')
+        if len(buffer) < BYTES_HEADER_SIZE or bytes(buffer[:3]) != BYTES_MAGIC \
+                or buffer[3] not in WIDTH_TYPECODES or len(buffer) % buffer[3]:
+            raise ValueError("Data is not a valid binary cipher")
+        width = buffer[3]
+        payload = buffer[BYTES_HEADER_SIZE:].cast(WIDTH_TYPECODES[width])
+
+        if self.use_numpy(payload, backend) and payload:
+            if not self.key_schedule:
+                raise ZeroDivisionError("integer modulo by zero")
+            codes = np.frombuffer(payload, dtype=f'<u{width}').astype(np.int64)
+            return from_code_points(codes - np.resize(self.numpy_schedule, codes.size))
+
+        codes = array(WIDTH_TYPECODES[width], payload)
+        if sys.byteorder == 'big':
+            codes.byteswap()
+        return self.shift_python(codes, -1)
+
+
+    def encrypt_stream(self, reader, writer, chunk_size=DEFAULT_CHUNK_SIZE, backend='auto',
+                       workers=None):
+        """ Encrypt a text stream chunk by chunk, keeping the key position across chunks
+        Args:
+            reader (text stream): readable stream of the real data
+            writer (text stream): writable stream for the encrypted data
+            chunk_size (int): number of characters read at a time
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large chunks
+            workers (int, optional): number of processes shifting chunks concurrently
+        Returns:
+            int: number of characters encrypted
+        """
+        return self.shift_stream(reader, writer, 1, chunk_size, backend, workers)
+
+
+    def decrypt_stream(self, reader, writer, chunk_size=DEFAULT_CHUNK_SIZE, backend='auto',
+                       workers=None):
+        """ Decrypt a text stream chunk by chunk, keeping the key position across chunks
+        Args:
+            reader (text stream): readable stream of the encrypted data
+            writer (text stream): writable stream for the decrypted data
+            chunk_size (int): number of characters read at a time
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large chunks
+            workers (int, optional): number of processes shifting chunks concurrently
+        Returns:
+            int: number of characters decrypted
+        """
+        return self.shift_stream(reader, writer, -1, chunk_size, backend, workers)
+
+
+    def shift_stream(self, reader, writer, sign, chunk_size=DEFAULT_CHUNK_SIZE, backend='auto',
+                     workers=None):
+        """ Shift a text stream chunk by chunk, so memory depends only on chunk_size
+        Args:
+            reader (text stream): readable stream
+            writer (text stream): writable stream
+            sign (int): 1 to encrypt, -1 to decrypt
+            chunk_size (int): number of characters read at a time
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large chunks
+            workers (int, optional): number of processes shifting chunks concurrently
+        Returns:
+            int: number of characters shifted
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive number")
+        if workers and workers > 1:
+            return self.shift_stream_parallel(reader, writer, sign, chunk_size, backend, workers)
+
+        offset = 0
+        while chunk := reader.read(chunk_size):
+            writer.write(self.shift(chunk, sign, backend, offset))
+            offset += len(chunk)
+        return offset
+
+
+    def shift_stream_parallel(self, reader, writer, sign, chunk_size, backend, workers):
+        """ Shift a text stream with one chunk per worker in flight, writing results in order
+        Args:
+            reader (text stream): readable stream
+            writer (text stream): writable stream
+            sign (int): 1 to encrypt, -1 to decrypt
+            chunk_size (int): number of characters read at a time
+            backend (string): 'python', 'numpy' or 'auto', used by every worker
+            workers (int): number of processes
+        Returns:
+            int: number of characters shifted
+        """
+        offset = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while chunks := [chunk for chunk in (reader.read(chunk_size) for _ in range(workers))
+                             if chunk]:
+                offsets = accumulate((len(chunk) for chunk in chunks[:-1]), initial=offset)
+                for shifted in executor.map(shift_chunk, repeat(self.key), chunks, repeat(sign),
+                                            repeat(backend), offsets):
+                    writer.write(shifted)
+                offset += sum(len(chunk) for chunk in chunks)
+        return offset
+
+
+    def encrypt_file(self, source_path, target_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                     backend='auto', workers=None):
+        """ Encrypt a utf-8 file into another file without loading it in memory
+        Args:
+            source_path (str): path of the file to be encrypted
+            target_path (str): path of the encrypted file to be written
+            chunk_size (int): number of characters read at a time
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large chunks
+            workers (int, optional): number of processes shifting chunks concurrently
+        Returns:
+            int: number of characters encrypted
+        """
+        with open(source_path, encoding='utf-8', newline='') as reader, \
+             open(target_path, 'w', encoding='utf-8', errors='surrogatepass',
+                  newline='') as writer:
+            return self.encrypt_stream(reader, writer, chunk_size, backend, workers)
+
+
+    def decrypt_file(self, source_path, target_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                     backend='auto', workers=None):
+        """ Decrypt an encrypted file into another file without loading it in memory
+        Args:
+            source_path (str): path of the encrypted file
+            target_path (str): path of the decrypted file to be written
+            chunk_size (int): number of characters read at a time
+            backend (string): 'python', 'numpy' or 'auto' to pick numpy for large chunks
+            workers (int, optional): number of processes shifting chunks concurrently
+        Returns:
+            int: number of characters decrypted
+        """
+        with open(source_path, encoding='utf-8', errors='surrogatepass', newline='') as reader, \
+             open(target_path, 'w', encoding='utf-8', newline='') as writer:
+            return self.decrypt_stream(reader, writer, chunk_size, backend, workers)
+
+
+def code_width(max_code):
+    """ Return the number of bytes needed to store every code point up to max_code
+    Args:
+        max_code (int): the biggest encrypted code point
+    Raises:
+        ValueError: when max_code is out of the unicode range, the same as chr()
+    Returns:
+        int: 2 or 4
+    """
+    if max_code > MAX_CODE_POINT:
+        raise ValueError("chr() arg not in range(0x110000)")
+    return 2 if max_code <= 0xFFFF else 4
+
+
+def bytes_header(width):
+    """ Return the binary cipher header for the given code point width
+    Args:
+        width (int): 2 or 4
+    Returns:
+        bytes
+    """
+    return BYTES_MAGIC + bytes([width])
+
+
+def code_points(data):
+    """ Convert a string into a numpy array of its code points
+    Args:
+        data (string)
+    Returns:
+        numpy.ndarray: int64 code points
+    """
+    return np.frombuffer(data.encode('utf-32-le', 'surrogatepass'), dtype='<u4').astype(np.int64)
+
+
+def from_code_points(codes):
+    """ Convert a numpy array of code points back into a string
+    Args:
+        codes (numpy.ndarray): code points
+    Raises:
+        ValueError: when a code point is out of the unicode range, the same as chr()
+    Returns:
+        str
+    """
+    if codes.size and (codes.min() < 0 or codes.max() > MAX_CODE_POINT):
+        raise ValueError("chr() arg not in range(0x110000)")
+    return codes.astype('<u4').tobytes().decode('utf-32-le', 'surrogatepass')
+
+
+@lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def get_cipher(key):
+    """ Return a shared Cipher for key, keeping the most recently used ones cached.
+    Cached instances are shared, so don't call set_key() on them
+    Args:
+        key (str): cipher key
+    Returns:
+        Cipher
+    """
+    return Cipher(key)
 
-        key_index = 0
-        for index_data, element_data in enumerate(encrypted_data):
-            key_index = self.get_key_index(index_data, key_index)
-            decrypted += (chr( element_data - (key2[key_index] << 1) ))
 
-        return decrypted
+def shift_chunk(key, data, sign, backend, offset):
+    """ Shift one chunk of data, runs inside a worker process
+    Args:
+        key (str): cipher key
+        data (string): the chunk needed to be shifted
+        sign (int): 1 to encrypt, -1 to decrypt
+        backend (string): 'python', 'numpy' or 'auto'
+        offset (int): position of the chunk's first character in the whole message
+    Returns:
+        str: shifted chunk
+    """
+    return get_cipher(key).shift(data, sign, backend, offset)
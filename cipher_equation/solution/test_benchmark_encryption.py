@@ -0,0 +1,42 @@
+""" This module test funcitonality of the cipher benchmark suite """
+import pytest
+
+from .benchmark_encryption import find_regressions, make_data, parse_size, run_benchmarks
+
+
+@pytest.mark.parametrize('size, expected_size', [('1K', 1024), ('2m', 2 << 20), ('10', 10)])
+def test_parse_size(size, expected_size):
+    """ Ensure that parse_size() understands K, M and G units
+    Returns:
+        bool
+    """
+    assert parse_size(size) == expected_size
+    assert len(make_data(parse_size(size), 'non-ascii')) == expected_size
+
+
+def test_run_benchmarks():
+    """ Ensure that every selected path is timed and compared against a baseline
+    Returns:
+        bool
+    """
+    results = run_benchmarks(['1K'], keys=('short',), kinds=('ascii',),
+                             paths={'python', 'stream', 'loop'}, repeat=1)
+    assert set(results) == {'one-shot/python/1K/short/ascii', 'one-shot/stream/1K/short/ascii',
+                            'many/loop/1K/short/ascii'}
+
+    baseline = {name: {'seconds': result['seconds'] / 10, 'size': result['size']}
+                for name, result in results.items()}
+    assert set(find_regressions(results, baseline)) == set(results)
+    assert not find_regressions(results, results)
+
+
+def test_run_decrypt_and_file_paths():
+    """ Ensure that the decrypt and file paths are timed on inputs prepared beforehand
+    Returns:
+        bool
+    """
+    paths = {'decrypt-python', 'decrypt-stream', 'decrypt-bytes-python', 'file', 'decrypt-file',
+             'decrypt-loop', 'decrypt-many-python'}
+    results = run_benchmarks(['1K'], keys=('short',), kinds=('non-ascii',), paths=paths,
+                             repeat=1)
+    assert {name.split('/')[1] for name in results} == paths
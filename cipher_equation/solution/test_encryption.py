@@ -1,6 +1,8 @@
 """ This module test funcitonality of encrypt() and decrypt() functions """
+import io
+
 import pytest
-from .encryption import Cipher
+from .encryption import Cipher, get_cipher
 
 
 @pytest.mark.parametrize('real_data, expected_encrypted_data, key', [
@@ -35,3 +37,187 @@ def test_decrypt(real_data, encrypted_data, key):
     cipher = Cipher(key)
     decryption_result = cipher.decrypt(encrypted_data)
     assert real_data == decryption_result
+
+
+@pytest.mark.parametrize('real_data, key', [
+    ("hi, it is me, how are you? are you ok? can you speak?" * 50, 'yahyaAbbadi'),
+    ("مرحبا، كيف حالك؟ Ünïcödé 😀 " * 40, 'ReemaR'),
+    ("x", 'a long key that is longer than the data'),
+    ("", 'ReemaR'),
+    ])
+def test_numpy_backend_matches_python(real_data, key):
+    """ Ensure that the numpy backend encrypts and decrypts exactly like the python loop
+    Returns:
+        bool
+    """
+    pytest.importorskip('numpy')
+    cipher = Cipher(key)
+    encrypted = cipher.encrypt(real_data, backend='python')
+    assert cipher.encrypt(real_data, backend='numpy') == encrypted
+    assert cipher.decrypt(encrypted, backend='numpy') == real_data
+
+
+def test_numpy_backend_out_of_range():
+    """ Ensure that the numpy backend raises ValueError like chr() on invalid code points
+    Returns:
+        bool
+    """
+    pytest.importorskip('numpy')
+    with pytest.raises(ValueError):
+        Cipher('ReemaR').decrypt("abc", backend='numpy')
+
+
+def test_invalid_backend():
+    """ Ensure that an unknown backend name raises ValueError
+    Returns:
+        bool
+    """
+    with pytest.raises(ValueError):
+        Cipher('ReemaR').encrypt("abc", backend='rust')
+
+
+@pytest.mark.parametrize('chunk_size, backend', [(1, 'python'), (7, 'python'), (11, 'numpy'),
+                                                 (1000, 'auto')])
+def test_stream_matches_encrypt(chunk_size, backend):
+    """ Ensure that streamed encryption keeps the key position across chunk boundaries
+        and decrypts back to the real data
+    Returns:
+        bool
+    """
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    real_data = "hi, it is me,\r\nhow are you? Ünïcödé 😀 " * 20
+    cipher = Cipher('yahyaAbbadi')
+
+    encrypted = io.StringIO()
+    assert cipher.encrypt_stream(io.StringIO(real_data), encrypted, chunk_size, backend) == \
+        len(real_data)
+    assert encrypted.getvalue() == cipher.encrypt(real_data)
+
+    decrypted = io.StringIO()
+    cipher.decrypt_stream(io.StringIO(encrypted.getvalue()), decrypted, chunk_size, backend)
+    assert decrypted.getvalue() == real_data
+
+
+def test_encrypt_file(tmp_path):
+    """ Ensure that file to file encryption and decryption round trip the data
+    Returns:
+        bool
+    """
+    real_data = "Hola Amigos,\r\nHow are you?\n" * 100
+    source, encrypted, decrypted = (tmp_path / name for name in ('real', 'enc', 'dec'))
+    source.write_bytes(real_data.encode('utf-8'))
+    cipher = Cipher('ReemaR')
+
+    cipher.encrypt_file(source, encrypted, chunk_size=13)
+    cipher.decrypt_file(encrypted, decrypted, chunk_size=17)
+    assert encrypted.read_bytes().decode('utf-8', 'surrogatepass') == cipher.encrypt(real_data)
+    assert decrypted.read_bytes() == source.read_bytes()
+
+
+@pytest.mark.parametrize('workers, key', [(2, 'yahyaAbbadi'), (3, 'ReemaR'), (8, 'a')])
+def test_parallel_matches_serial(workers, key):
+    """ Ensure that splitting the data across processes gives the same result as one process
+    Returns:
+        bool
+    """
+    real_data = "hi, it is me, how are you? Ünïcödé 😀 " * 37
+    cipher = Cipher(key)
+    encrypted = cipher.encrypt(real_data, workers=workers)
+    assert encrypted == cipher.encrypt(real_data)
+    assert cipher.decrypt(encrypted, workers=workers) == real_data
+
+
+def test_parallel_stream_matches_encrypt():
+    """ Ensure that the parallel stream writes chunks back in order with the right key positions
+    Returns:
+        bool
+    """
+    real_data = "Hola Amigos, How are you?\n" * 50
+    cipher = Cipher('ReemaR')
+    encrypted = io.StringIO()
+    cipher.encrypt_stream(io.StringIO(real_data), encrypted, chunk_size=29, workers=3)
+    assert encrypted.getvalue() == cipher.encrypt(real_data)
+
+
+@pytest.mark.parametrize('backend', ['python', 'numpy'])
+def test_encrypt_many(backend):
+    """ Ensure that every message in a batch is encrypted on its own from the first key index
+    Returns:
+        bool
+    """
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    messages = ["hi, it is me", "", "Ünïcödé 😀", "Hola Amigos, How are you?" * 20]
+    cipher = Cipher('ReemaR')
+    encrypted = cipher.encrypt_many(messages, backend=backend)
+    assert encrypted == [cipher.encrypt(message) for message in messages]
+    assert cipher.decrypt_many(encrypted, backend=backend) == messages
+
+
+def test_set_key_updates_schedule():
+    """ Ensure that set_key() recomputes the cached key schedule
+    Returns:
+        bool
+    """
+    cipher = Cipher('yahyaAbbadi')
+    cipher.set_key('ReemaR')
+    assert cipher.encrypt("Hola Amigos, How are you?") == 'ìĹĶĻâåđĳıŉĵÐÄĒĹőâąĖįêœıęã'
+
+
+def test_get_cipher_is_cached():
+    """ Ensure that get_cipher() returns the same instance for the same key
+    Returns:
+        bool
+    """
+    assert get_cipher('ReemaR') is get_cipher('ReemaR')
+    assert get_cipher('ReemaR').get_key() == 'ReemaR'
+
+
+@pytest.mark.parametrize('real_data, width', [
+    ("hi, it is me, how are you? are you ok? can you speak?", 2),
+    ("Hola Amigos 😀, How are you?" * 20, 4),
+    ("", 2),
+    ])
+@pytest.mark.parametrize('backend', ['python', 'numpy'])
+def test_bytes_round_trip(real_data, width, backend):
+    """ Ensure that the binary cipher uses the smallest code point width
+        and decrypts back to the real data with any backend
+    Returns:
+        bool
+    """
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    cipher = Cipher('yahyaAbbadi')
+    encrypted = cipher.encrypt_to_bytes(real_data, backend=backend)
+    assert isinstance(encrypted, memoryview)
+    assert encrypted[3] == width
+    assert len(encrypted) == 4 + width * len(real_data)
+    assert bytes(encrypted) == bytes(cipher.encrypt_to_bytes(real_data, backend='python'))
+    assert cipher.decrypt_from_bytes(encrypted, backend=backend) == real_data
+    assert cipher.decrypt_from_bytes(bytes(encrypted), backend=backend) == real_data
+
+
+@pytest.mark.parametrize('buffer', [b'', b'CPH\x03', b'XYZ\x02ab', b'CPH\x04abc'])
+def test_decrypt_invalid_bytes(buffer):
+    """ Ensure that decrypt_from_bytes() rejects data without a valid header
+    Returns:
+        bool
+    """
+    with pytest.raises(ValueError):
+        Cipher('ReemaR').decrypt_from_bytes(buffer)
+
+
+@pytest.mark.parametrize('backend', ['python', 'numpy'])
+def test_bytes_empty_key(backend):
+    """ Ensure that an empty key is rejected by the binary cipher with any backend
+    Returns:
+        bool
+    """
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    cipher = Cipher('')
+    with pytest.raises(ZeroDivisionError):
+        cipher.encrypt_to_bytes('Hola Amigos', backend=backend)
+    with pytest.raises(ZeroDivisionError):
+        cipher.decrypt_from_bytes(b'CPH\x02a\x00b\x00', backend=backend)
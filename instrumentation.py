@@ -0,0 +1,114 @@
+''' This module records opt-in call statistics of the hot paths of the packages of this
+repository, which all import it, so one enable() and one snapshot() cover all of them.
+Instrumented functions only check a flag while instrumentation is disabled '''
+from collections import deque
+from functools import wraps
+from time import perf_counter
+
+
+# Number of most recent latencies of every path kept for the percentiles
+LATENCY_SAMPLES = 1024
+PERCENTILES = (50, 90, 99)
+
+ENABLED = False
+# {path name: PathStats}
+STATS = {}
+# Functions called with (path name, seconds, size) after every instrumented call
+HOOKS = []
+
+
+class PathStats:
+    """ Call statistics of one instrumented path """
+    __slots__ = ('calls', 'seconds', 'size', 'latencies')
+
+    def __init__(self):
+        """
+        Construct all the necessary attributes for the PathStats object.
+        """
+        self.calls = 0
+        self.seconds = 0.0
+        self.size = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+
+def enable():
+    """ Start recording the instrumented calls """
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = True
+
+
+def disable():
+    """ Stop recording the instrumented calls, the recorded statistics are kept """
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = False
+
+
+def reset():
+    """ Drop the recorded statistics """
+    STATS.clear()
+
+
+def add_hook(hook):
+    """ Call hook after every instrumented call while instrumentation is enabled
+    Args:
+        hook (callable): function taking the path name, the seconds taken and the size processed
+    """
+    HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    """ Stop calling a hook added by add_hook()
+    Args:
+        hook (callable): hook function
+    """
+    HOOKS.remove(hook)
+
+
+def snapshot():
+    """ Return a copy of the recorded statistics
+    Returns:
+        dict: path name -> {'calls', 'seconds', 'size', 'p50', 'p90', 'p99', 'max'},
+            the percentiles are computed over the LATENCY_SAMPLES most recent calls
+    """
+    stats = {}
+    for name, path_stats in STATS.items():
+        latencies = sorted(path_stats.latencies)
+        stats[name] = {'calls': path_stats.calls, 'seconds': path_stats.seconds,
+                       'size': path_stats.size}
+        for percentile in PERCENTILES:
+            index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+            stats[name][f'p{percentile}'] = latencies[index] if latencies else 0.0
+        stats[name]['max'] = latencies[-1] if latencies else 0.0
+    return stats
+
+
+def instrumented(size=None):
+    """ Decorator recording the calls of a function while instrumentation is enabled
+    Args:
+        size (callable, optional): function taking the call's positional arguments and result
+            and returning the size processed (characters, bytes or elements)
+    Returns:
+        callable: decorator
+    """
+    def decorate(function):
+        name = function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = perf_counter()
+            result = function(*args, **kwargs)
+            seconds = perf_counter() - start
+            processed = size(args, result) if size else 0
+            if (path_stats := STATS.get(name)) is None:
+                path_stats = STATS[name] = PathStats()
+            path_stats.calls += 1
+            path_stats.seconds += seconds
+            path_stats.size += processed
+            path_stats.latencies.append(seconds)
+            for hook in HOOKS:
+                hook(name, seconds, processed)
+            return result
+        return wrapper
+    return decorate
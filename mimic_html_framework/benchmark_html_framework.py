@@ -0,0 +1,321 @@
+""" Benchmark building, rendering and querying HTMLElement trees of different shapes and sizes
+
+Usage (from the repository root):
+    python -m mimic_html_framework.benchmark_html_framework --sizes 1K 100K --save baseline.json
+    python -m mimic_html_framework.benchmark_html_framework --sizes 1K 100K --baseline baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from .html_framework import HTMLElement
+
+
+SIZE_UNITS = {'K': 1000, 'M': 1000 ** 2}
+DEFAULT_SIZES = ['1K', '10K', '100K']
+ALL_SIZES = ['1K', '10K', '100K', '1M']
+# Depth of the chains of a deep tree, deeper than the default recursion limit.
+# Rendered deep trees are big: every line is indented by its level
+DEEP_DEPTH = 1024
+# Children of every list of a realistic tree
+LIST_ITEMS = 5
+# A case is a regression when it takes this many times the baseline time or memory
+DEFAULT_THRESHOLD = 1.25
+
+
+def parse_size(size):
+    """ Convert a human readable size like 10K into a number of nodes
+    Args:
+        size (str): a number followed by an optional K or M unit
+    Returns:
+        int: number of nodes
+    """
+    size = size.strip().upper()
+    if size[-1:] in SIZE_UNITS:
+        return int(size[:-1]) * SIZE_UNITS[size[-1]]
+    return int(size)
+
+
+def build_wide(nodes):
+    """ Build a body holding nodes - 1 paragraphs, every tenth one with an id
+    Args:
+        nodes (int): number of elements
+    Returns:
+        HTMLElement: root of the tree
+    """
+    root = HTMLElement('body', {'id': 'root'})
+    for index in range(1, nodes):
+        attrs = {'class': 'item'}
+        if not index % 10:
+            attrs['id'] = f'p{index}'
+        HTMLElement.append(root, HTMLElement('p', attrs, f'paragraph {index}'))
+    return root
+
+
+def build_deep(nodes):
+    """ Build a body holding chains of DEEP_DEPTH nested divs, every tenth one with an id
+    Args:
+        nodes (int): number of elements
+    Returns:
+        HTMLElement: root of the tree
+    """
+    root = HTMLElement('body', {'id': 'root'})
+    parent = root
+    for index in range(1, nodes):
+        attrs = {'class': 'item'}
+        if not index % 10:
+            attrs['id'] = f'div{index}'
+        elem = HTMLElement('div', attrs)
+        # Start a new chain under the root every DEEP_DEPTH elements
+        HTMLElement.append(root if index % DEEP_DEPTH == 1 else parent, elem)
+        parent = elem
+    HTMLElement.append(parent, 'leaf')
+    return root
+
+
+def build_realistic(nodes):
+    """ Build an html page whose body holds articles with a heading, a paragraph
+    with a link and a list, the way generated pages look
+    Args:
+        nodes (int): number of elements, the last article may make it a little bigger
+    Returns:
+        HTMLElement: root of the tree
+    """
+    body = HTMLElement('body', {'id': 'root'})
+    head = HTMLElement('head', val=HTMLElement('title', val='Benchmark page'))
+    root = HTMLElement('html', val=[head, body])
+    created = 4
+    index = 0
+    while created < nodes:
+        items = [HTMLElement('li', {'class': 'item'}, f'item {item}') for item in range(LIST_ITEMS)]
+        article = HTMLElement('article', {'id': f'article{index}', 'class': 'post'}, [
+            HTMLElement('h2', val=f'Article {index}'),
+            HTMLElement('p', {'class': 'summary'}, [
+                'Read ', HTMLElement('a', {'href': f'/posts/{index}', 'target': '_blank'}, 'more')]),
+            HTMLElement('ul', val=items),
+        ])
+        HTMLElement.append(body, article)
+        created += 5 + LIST_ITEMS
+        index += 1
+    return root
+
+
+SHAPES = {'wide': build_wide, 'deep': build_deep, 'realistic': build_realistic}
+# Arguments of the finders for every shape: a common attribute, an id and a tag name
+QUERIES = {
+    'wide': {'attr': ('class', 'item'), 'id': 'p10', 'tag_name': 'p', 'selector': 'body > p.item'},
+    'deep': {'attr': ('class', 'item'), 'id': 'div10', 'tag_name': 'div',
+             'selector': 'div > div.item'},
+    'realistic': {'attr': ('class', 'item'), 'id': 'article0', 'tag_name': 'li',
+                  'selector': 'article.post ul > li'},
+}
+
+
+def clear_render_cache(root):
+    """ Drop the cached render and serialized attributes of every element
+    so the next render starts from scratch
+    Args:
+        root (HTMLElement): root of the tree
+    """
+    for elem in HTMLElement.iter_subtree(root):
+        elem.render_cache = None
+        elem.attrs_html = None
+
+
+def render_quietly(root):
+    """ Call render() without printing the document
+    Args:
+        root (HTMLElement): root of the tree
+    """
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        HTMLElement.render(root)
+
+
+def make_cases(shape, root, out_dir):
+    """ Build the cases run on an already built tree
+    Args:
+        shape (str): a SHAPES name
+        root (HTMLElement): root of the tree
+        out_dir (str): directory for rendered files
+    Returns:
+        dict: case -> (function without arguments, setup function without arguments or None)
+    """
+    queries = QUERIES[shape]
+    file_name = os.path.join(out_dir, f'{shape}.html')
+    cold = lambda: clear_render_cache(root)
+    return {
+        'render': (lambda: render_quietly(root), cold),
+        'render-cached': (lambda: render_quietly(root), None),
+        'render_html_file': (lambda: HTMLElement.render_html_file(root, file_name), cold),
+        'render_html_file-minified-gzip': (
+            lambda: HTMLElement.render_html_file(root, f'{file_name}.gz', minify=True,
+                                                 compression='gzip'), cold),
+        'find_elements_by_attr': (
+            lambda: HTMLElement.find_elements_by_attr(root, *queries['attr']), None),
+        'find_elements_by_id': (
+            lambda: HTMLElement.find_elements_by_id(root, queries['id']), None),
+        'find_elements_by_tag_name': (
+            lambda: HTMLElement.find_elements_by_tag_name(root, queries['tag_name']), None),
+        'find_first': (lambda: HTMLElement.find_first(root, queries['selector']), None),
+        'select': (lambda: HTMLElement.select(root, queries['selector']), None),
+    }
+
+
+CASES = ['build', 'render', 'render-cached', 'render_html_file', 'render_html_file-minified-gzip',
+         'find_elements_by_attr', 'find_elements_by_id', 'find_elements_by_tag_name', 'find_first',
+         'select']
+
+
+def measure(function, repeat, setup=None, memory=True):
+    """ Run function repeat times, keeping the fastest run, then once more tracing its memory
+    Args:
+        function (callable): function without arguments
+        repeat (int): number of timed runs
+        setup (callable, optional): function without arguments called before every run
+        memory (bool): trace the peak memory allocated by a run
+    Returns:
+        float: seconds
+        int: peak bytes allocated, None when memory is False
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(timings), peak
+
+
+def run_benchmarks(sizes, shapes=tuple(SHAPES), cases=None, repeat=3, memory=True):
+    """ Time every selected case for every selected tree
+    Args:
+        sizes (list): sizes like '1K' or '1M'
+        shapes (tuple): SHAPES names
+        cases (set, optional): CASES to run, all of them by default
+        repeat (int): number of runs per case, the fastest one is kept
+        memory (bool): record the peak memory of every case
+    Returns:
+        dict: case name -> {'seconds': float, 'nodes': int, 'peak_bytes': int | None}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size_name in sizes:
+            nodes = parse_size(size_name)
+            for shape in shapes:
+                build = SHAPES[shape]
+                if not cases or 'build' in cases:
+                    seconds, peak = measure(lambda build=build: build(nodes), repeat,
+                                            memory=memory)
+                    results[f'build/{shape}/{size_name}'] = {
+                        'seconds': seconds, 'nodes': nodes, 'peak_bytes': peak}
+
+                root = build(nodes)
+                for case, (function, setup) in make_cases(shape, root, out_dir).items():
+                    if cases and case not in cases:
+                        continue
+                    seconds, peak = measure(function, repeat, setup, memory)
+                    results[f'{case}/{shape}/{size_name}'] = {
+                        'seconds': seconds, 'nodes': nodes, 'peak_bytes': peak}
+    return results
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """ Compare results with a baseline run of the same cases
+    Args:
+        results (dict): run_benchmarks() output
+        baseline (dict): a previous run_benchmarks() output
+        threshold (float): allowed slowdown or memory growth ratio
+    Returns:
+        dict: case name -> {'seconds' or 'peak_bytes': ratio}, for the cases over threshold
+    """
+    regressions = {}
+    for name, result in results.items():
+        for metric in ('seconds', 'peak_bytes'):
+            base = baseline.get(name, {}).get(metric)
+            if base and result.get(metric) is not None:
+                ratio = result[metric] / base
+                if ratio > threshold:
+                    regressions.setdefault(name, {})[metric] = ratio
+    return regressions
+
+
+def format_report(results, baseline=None):
+    """ Format results as a table, with the time per node that shows super-linear cases,
+    and the ratio to the baseline when given
+    Args:
+        results (dict): run_benchmarks() output
+        baseline (dict, optional): a previous run_benchmarks() output
+    Returns:
+        str: report
+    """
+    lines = [f"{'case':<52} {'seconds':>12} {'us/node':>9} {'peak MB':>9} {'vs base':>8}"]
+    for name, result in results.items():
+        per_node = result['seconds'] / result['nodes'] * 1e6
+        peak = '' if result['peak_bytes'] is None else f"{result['peak_bytes'] / (1 << 20):.1f}"
+        ratio = ''
+        if baseline and name in baseline and baseline[name]['seconds']:
+            ratio = f"{result['seconds'] / baseline[name]['seconds']:.2f}x"
+        lines.append(f"{name:<52} {result['seconds']:>12.6f} {per_node:>9.3f} {peak:>9} "
+                     f"{ratio:>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """ Run the benchmarks from the command line
+    Args:
+        argv (list, optional): command line arguments
+    Returns:
+        int: exit code, 1 when a regression is found
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        help=f"numbers of nodes, e.g. {' '.join(ALL_SIZES)}")
+    parser.add_argument('--shapes', nargs='+', default=list(SHAPES), choices=list(SHAPES))
+    parser.add_argument('--cases', nargs='+', choices=CASES, help="cases to run")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true',
+                        help="don't trace the peak memory of every case")
+    parser.add_argument('--save', help="write the results as json to this file")
+    parser.add_argument('--baseline', help="compare with results saved by --save")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.shapes, set(args.cases or ()), args.repeat,
+                             not args.no_memory)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+    print(format_report(results, baseline))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if baseline and (regressions := find_regressions(results, baseline, args.threshold)):
+        for name, ratios in regressions.items():
+            for metric, ratio in ratios.items():
+                print(f"REGRESSION {name}: {metric} is {ratio:.2f}x the baseline")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,44 @@
 ''' This module implement html framework that initiate, append, render, and find elements '''
+import functools
+import gzip
+import json
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from operator import attrgetter
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+from instrumentation import instrumented
+
+# Number of characters collected by render_to() before each write to the stream
+RENDER_BUFFER_SIZE = 1 << 16
+# Fragments longer than this are only cached for the element render was called on,
+# so deep documents don't keep a copy of every nested subtree
+RENDER_CACHE_LIMIT = 1 << 16
+# Indexed candidate sets up to this size are sorted into document order by their paths,
+# bigger ones by the pre-order numbers of the elements, numbering the document when needed
+SORTED_CANDIDATES_LIMIT = 64
+# Sort key of the elements of a numbered document
+ORDER_KEY = attrgetter('order')
+# Compressed streams writable by render_to() and render_html_file(), zstd needs python 3.14+
+COMPRESSORS = {'gzip': functools.partial(gzip.open, compresslevel=6)}
+if zstd is not None:
+    COMPRESSORS['zstd'] = zstd.open
+# Number of documents submitted to the pool per worker while render_many() waits for results
+RENDER_MANY_BACKLOG = 4
+# Tokens of a selector group: combinators, and compound selectors like div.class#id[attr=val]
+SELECTOR_TOKEN = re.compile(r'\s*(?P<combinator>[>,])\s*|(?P<descendant>\s+)'
+                            r'|(?P<compound>(?:\*|[\w!-]+|#[\w-]+|\.[\w-]+|\[[^\]]*\])+)')
+SIMPLE_SELECTOR = re.compile(r'(?P<tag>\*|[\w!-]+)|#(?P<id>[\w-]+)|\.(?P<class_name>[\w-]+)'
+                             r'|\[\s*(?P<attr>[\w-]+)\s*(?:=\s*(?P<quote>["\']?)(?P<attr_val>.*?)'
+                             r'(?P=quote))?\s*\]')
+
+
 class TagNameError(Exception):
     """ Create custom exception
 
@@ -8,20 +48,19 @@ class TagNameError(Exception):
     Returns:
         str: Exception message
     """
-    valid_tag_names = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'strong', 'abbr', 'a', 'big',
-                    'b', 'html', 'head', 'body', 'form', 'input', 'em', 'dd', 'dl', 'dt', 'i',
-                    'li', 'ol', 'marquee', 'strike', 'table', 'th', 'td', 'tr', 'tt', 'u', 'title',
-                    '!--', 'address', 'article', 'aside', 'audio', 'bdi', 'bdo', 'blockquote',
-                    'button', 'canvas', 'caption', 'cite', 'code', 'colgroup', 'text', 'data',
-                    'datalist', 'del', 'details', 'dfn', 'dialog', 'div', 'em', 'embed', 'fieldset',
-                    'figure',  'figcaption', 'footer', 'header', 'i', 'iframe', 'ins', 'kbd',
-                    'legend', 'label', 'main', 'map', 'mark', 'meter', 'nav', 'noscript', 'object',
-                    'optgroup', 'option', 'output', 'picture', 'pre', 'progress', 'q', 'rp', 'rt',
-                    'ruby', 's', 'samp', 'script', 'section', 'select', 'small', 'span', 'style',
-                    'sub', 'summary', 'sup', 'svg', 'tbody', 'template', 'textarea', 'tfoot',
-                    'thead', 'time', 'ul', 'var', 'video', 'wbr', '!DOCTYPE', 'br', 'embed', 'hr',
-                    'img', 'link', 'input', 'menu', 'area', 'source', 'base', 'col', 'meta',
-                    'param', 'track']
+    valid_tag_names = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'strong', 'abbr', 'a', 'big', 'b',
+                    'html', 'head', 'body', 'form', 'input', 'em', 'dd', 'dl', 'dt', 'i', 'li',
+                    'ol', 'marquee', 'strike', 'table', 'th', 'td', 'tr', 'tt', 'u', 'title', '!--',
+                    'address', 'article', 'aside', 'audio', 'bdi', 'bdo', 'blockquote', 'button',
+                    'canvas', 'caption', 'cite', 'code', 'colgroup', 'text', 'data', 'datalist',
+                    'del', 'details', 'dfn', 'dialog', 'div', 'embed', 'fieldset', 'figure',
+                    'figcaption', 'footer', 'header', 'iframe', 'ins', 'kbd', 'legend', 'label',
+                    'main', 'map', 'mark', 'meter', 'nav', 'noscript', 'object', 'optgroup',
+                    'option', 'output', 'picture', 'pre', 'progress', 'q', 'rp', 'rt', 'ruby', 's',
+                    'samp', 'script', 'section', 'select', 'small', 'span', 'style', 'sub',
+                    'summary', 'sup', 'svg', 'tbody', 'template', 'textarea', 'tfoot', 'thead',
+                    'time', 'ul', 'var', 'video', 'wbr', '!DOCTYPE', 'br', 'hr', 'img', 'link',
+                    'menu', 'area', 'source', 'base', 'col', 'meta', 'param', 'track']
 
     def __init__(self, tag_name, *args):
         """ Construct attributes for the TagNameError object
@@ -42,6 +81,9 @@ class TagNameError(Exception):
         """
         return f'Tag name {self.tag_name} is not valid, please specify a valid tag name'
 
+# Membership tests on a frozenset take O(1) instead of scanning the list
+VALID_TAG_NAMES = frozenset(TagNameError.valid_tag_names)
+
 class SameIdException(Exception):
     """ Create custom exception
 
@@ -50,8 +92,93 @@ class SameIdException(Exception):
     """
     pass
 
+class AttrsDict(dict):
+    """ Attributes of an HTMLElement: every change keeps the document's indexes
+    and the render cache of the element up to date
+    """
+    __slots__ = ('element',)
+
+    def __init__(self, element, attrs=()):
+        """ Construct the attributes of an element
+
+        Args:
+            element (HTMLElement): the element owning the attributes
+            attrs (dict, optional): initial attributes
+        """
+        super().__init__(attrs)
+        self.element = element
+
+    def change(self, method, *args):
+        """ Apply a dict method through HTMLElement.change_attrs()
+
+        Args:
+            method (callable): unbound dict method
+            args: method arguments
+
+        Returns:
+            the method's result
+        """
+        # Unpickling fills the dict before the element is set
+        element = getattr(self, 'element', None)
+        if element is None:
+            return method(self, *args)
+        return HTMLElement.change_attrs(element, lambda: method(self, *args))
+
+    def __setitem__(self, key, val):
+        self.change(dict.__setitem__, key, val)
+
+    def __delitem__(self, key):
+        self.change(dict.__delitem__, key)
+
+    def __ior__(self, other):
+        self.change(dict.update, other)
+        return self
+
+    def update(self, *args, **kwargs):
+        self.change(lambda attrs: dict.update(attrs, *args, **kwargs))
+
+    def setdefault(self, key, default=None):
+        return self.change(dict.setdefault, key, default)
+
+    def pop(self, key, *default):
+        return self.change(dict.pop, key, *default)
+
+    def popitem(self):
+        return self.change(dict.popitem)
+
+    def clear(self):
+        self.change(dict.clear)
+
+class DocumentIndex:
+    """ Indexes shared by all the elements of a document, kept up to date by HTMLElement
+    as elements are appended or removed. Element sets are insertion ordered dicts
+    """
+    __slots__ = ('ids', 'tags', 'attrs', 'attr_names', 'classes', 'numbered')
+
+    def __init__(self):
+        """ Construct the empty indexes of a document """
+        # {id value: element}
+        self.ids = {}
+        # {tag name: {element: None}}
+        self.tags = {}
+        # {(attribute key, attribute value): {element: None}}
+        self.attrs = {}
+        # {attribute key: {element: None}}
+        self.attr_names = {}
+        # {class name: {element: None}}
+        self.classes = {}
+        # Whether the order of every element is its pre-order number in the document,
+        # appending or removing elements makes it stale until number_elements() runs again
+        self.numbered = False
+
 class HTMLElement:
     """ A class to act as HTML framework that initiate, append, render, and find elements """
+    # Render cache counters, a hit reuses the cached fragment of a whole subtree
+    render_cache_stats = {'hits': 0, 'misses': 0}
+    # No per-instance __dict__, millions of elements can be kept alive
+    __slots__ = ('tag_name', '_attrs', 'value', 'elem_id', 'parent', 'position', 'document',
+                 'render_cache', 'attrs_html', 'order')
+
     def __init__(self, tag_name, attrs=None, val=None):
         """ Construct all the necessary attributes for the HTMLElement object
 
@@ -63,16 +190,66 @@ class HTMLElement:
         Raises:
             TagNameError: Raise custom exception when having invalid tag name
         """
-        if tag_name not in TagNameError.valid_tag_names:
+        if not isinstance(tag_name, str) or tag_name not in VALID_TAG_NAMES:
             raise TagNameError(tag_name)
-        self.tag_name = tag_name
-        self.attrs = attrs or {}
+        self.set_fields(tag_name, attrs)
+        self.handle_element_value(self, val)
+
+    def set_fields(self, tag_name, attrs):
+        """ Set the attributes of a new element without validating them
+
+        Args:
+            tag_name (str): HTML tag name
+            attrs (dict): HTML element attributes
+        """
+        # Interned, so all elements with the same tag share one string
+        self.tag_name = sys.intern(tag_name) if isinstance(tag_name, str) else tag_name
+        # Elements without attributes don't get a dict until attrs is used
+        self._attrs = AttrsDict(self, attrs) if attrs else None
         self.value = []
-        self.elem_id = attrs.get('id', None)
+        self.elem_id = attrs.get('id', None) if attrs else None
+        self.parent = None
+        # Index of this element in its parent's value list
+        self.position = None
+        # Every element of a document shares the same DocumentIndex,
+        # None while the element is alone in its document
+        self.document = None
+        # Rendered fragment of this element per indentation level: {level: html},
+        # the minified fragment is kept under the None level. None until the element is rendered
+        self.render_cache = None
+        # Serialized attributes, computed by the first render
+        self.attrs_html = None
+        # Pre-order number of this element in its document, see DocumentIndex.numbered
+        self.order = None
 
-        self.handle_element_value(self, val)
+    @property
+    def attrs(self):
+        """ HTML element attributes, changing them keeps the document's indexes
+        and the render cache up to date
+
+        Returns:
+            AttrsDict: HTML element attributes
+        """
+        if self._attrs is None:
+            self._attrs = AttrsDict(self)
+        return self._attrs
+
+    @attrs.setter
+    def attrs(self, attrs):
+        """ Set HTML element attributes
+
+        Args:
+            attrs (dict): HTML element attributes
+
+        Raises:
+            SameIdException: Raise custom exception when having elements with the same id value
+        """
+        def assign():
+            self._attrs = AttrsDict(self, attrs) if attrs else None
+        self.change_attrs(self, assign)
 
     @classmethod
+    @instrumented(size=lambda args, result: len(args[2]) if isinstance(args[2], list) else 1)
     def append(cls, element, val):
         """Append val to the given element
 
@@ -88,7 +265,9 @@ class HTMLElement:
     @classmethod
     def handle_element_value(cls, element, val):
         """Handle appending a value(or values) to the given element
-        considering value data type and custom exceptions
+        considering value data type and custom exceptions.
+        Only the ids of the appended subtrees are checked against the document's id registry,
+        so appending costs O(size of the appended subtrees)
 
         Args:
             element (HTMLElement): HTML element to append to
@@ -96,29 +275,323 @@ class HTMLElement:
 
         Raises:
             SameIdException: Raise custom exception when having elements with the same id value
+            ValueError: Raise when appending an element to itself or to one of its descendants
         """
         if not isinstance(val, list):
             val = [val] if val else []
+        if all(isinstance(appended_elem, str) for appended_elem in val):
+            element.value.extend(val)
+            cls.invalidate(element)
+            return
+
+        document = cls.get_document(element)
+        appended_ids = set()
+        ancestors = None
         for appended_elem in val:
             if isinstance(appended_elem, str):
                 continue
-            if list_elems_with_id:= cls.find_elements_by_id(appended_elem, element.elem_id):
-                if list_elems_with_id:
+            # Moving an element inside its own document doesn't add any id to it,
+            # but it can't be moved under itself
+            if appended_elem.document is document:
+                if ancestors is None:
+                    ancestors = set()
+                    node = element
+                    while node is not None:
+                        ancestors.add(node)
+                        node = node.parent
+                if appended_elem in ancestors:
+                    raise ValueError(f"{appended_elem!r} can't be appended inside itself")
+                continue
+            for elem in cls.iter_subtree(appended_elem):
+                if elem.elem_id is None:
+                    continue
+                if elem.elem_id in document.ids or elem.elem_id in appended_ids:
                     raise SameIdException(
-                        f"Shouldn't have same id value {element.elem_id} for more than one element")
+                        f"Shouldn't have same id value {elem.elem_id} for more than one element")
+                appended_ids.add(elem.elem_id)
 
-        if isinstance(val, list):
-            element.value.extend(val)
+        for appended_elem in val:
+            if not isinstance(appended_elem, str):
+                if appended_elem.parent is not None:
+                    cls.remove(appended_elem.parent, appended_elem)
+                appended_elem.parent = element
+                appended_elem.position = len(element.value)
+                cls.register_elements(appended_elem, document)
+                document.numbered = False
+            element.value.append(appended_elem)
+        cls.invalidate(element)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a whole document from nested element specs in one pass, like the ones of
+        a JSON template. Tag names and ids are validated once the tree is built, in O(n),
+        instead of on every element and append
+
+        Args:
+            spec (dict | str): {'tag_name': str, 'attrs': dict, 'val': value} where value is
+                a string, a spec or a list of them, or the same as a JSON string
+
+        Raises:
+            TagNameError: Raise custom exception when having invalid tag name
+            SameIdException: Raise custom exception when having elements with the same id value
+            TypeError: Raise when a spec is neither a dict nor a string
+
+        Returns:
+            HTMLElement: root of the document
+        """
+        if isinstance(spec, (str, bytes)):
+            spec = json.loads(spec)
+        if not isinstance(spec, dict):
+            raise TypeError(f"Invalid element spec {spec!r}")
+        root = cls.__new__(cls)
+        root.set_fields(spec.get('tag_name'), spec.get('attrs'))
+
+        # Children are built without validation or indexing
+        stack = [(root, spec.get('val'))]
+        while stack:
+            element, val = stack.pop()
+            if not isinstance(val, list):
+                val = [val] if val else []
+            for child_spec in val:
+                if isinstance(child_spec, str):
+                    element.value.append(child_spec)
+                    continue
+                if not isinstance(child_spec, dict):
+                    raise TypeError(f"Invalid element spec {child_spec!r}")
+                child = cls.__new__(cls)
+                child.set_fields(child_spec.get('tag_name'), child_spec.get('attrs'))
+                child.parent = element
+                child.position = len(element.value)
+                element.value.append(child)
+                stack.append((child, child_spec.get('val')))
+
+        document = DocumentIndex()
+        for elem in cls.iter_subtree(root):
+            if not isinstance(elem.tag_name, str) or elem.tag_name not in VALID_TAG_NAMES:
+                raise TagNameError(elem.tag_name)
+            if elem.elem_id is not None and elem.elem_id in document.ids:
+                raise SameIdException(
+                    f"Shouldn't have same id value {elem.elem_id} for more than one element")
+            elem.document = document
+            cls.index_element(document, elem)
+        return root
+
+    @classmethod
+    def remove(cls, element, val):
+        """Remove a child value from the given element, the removed element becomes the root
+        of its own document with its own indexes
+
+        Args:
+            element (HTMLElement): HTML element to remove from
+            val (str | HTMLElement): child value to be removed
+
+        Raises:
+            ValueError: Raise when val isn't a child of element
+        """
+        for index, child in enumerate(element.value):
+            if child is val:
+                del element.value[index]
+                break
         else:
-            element.value = val
+            raise ValueError(f"{val!r} is not a child of the given element")
+        for child in element.value[index:]:
+            if not isinstance(child, str):
+                child.position -= 1
+        cls.invalidate(element)
+
+        if not isinstance(val, str):
+            element.document.numbered = False
+            for elem in cls.iter_subtree(val):
+                cls.unindex_element(element.document, elem)
+            val.parent = val.position = None
+            cls.register_elements(val, DocumentIndex())
+
+    @classmethod
+    def set_attr(cls, element, attr_key, attr_val):
+        """Set an attribute of the given element keeping the document's indexes up to date
+
+        Args:
+            element (HTMLElement): HTML element
+            attr_key (str): attribute key
+            attr_val (str | number): attribute value
+
+        Raises:
+            SameIdException: Raise custom exception when having elements with the same id value
+        """
+        element.attrs[attr_key] = attr_val
+
+    @classmethod
+    def change_attrs(cls, element, change):
+        """Change the attributes of the given element, moving it in the document's indexes
+        and dropping its cached render. A change giving it the id of another element
+        of the document is undone
+
+        Args:
+            element (HTMLElement): HTML element
+            change (callable): function without arguments changing element._attrs
+
+        Raises:
+            SameIdException: Raise custom exception when having elements with the same id value
+
+        Returns:
+            the change's result
+        """
+        document = element.document
+        old_attrs = element._attrs
+        old_items = dict(old_attrs or {})
+        if document is not None:
+            cls.unindex_element(document, element)
+        try:
+            result = change()
+            elem_id = element._attrs.get('id', None) if element._attrs else None
+            if document is not None and elem_id is not None and elem_id != element.elem_id \
+                    and elem_id in document.ids:
+                raise SameIdException(
+                    f"Shouldn't have same id value {elem_id} for more than one element")
+        except Exception:
+            if old_attrs is not None:
+                dict.clear(old_attrs)
+                dict.update(old_attrs, old_items)
+            element._attrs = old_attrs
+            raise
+        finally:
+            element.elem_id = element._attrs.get('id', None) if element._attrs else None
+            if document is not None:
+                cls.index_element(document, element)
+            cls.invalidate(element)
+        return result
 
     @classmethod
-    def render(cls, element, level=0):
-        """ Traverse the given element to create HTML DOM syntax
+    def invalidate(cls, element):
+        """Drop the cached render of the given element and its ancestors.
+        Called by append(), remove() and attribute changes, call it after changing value directly
+
+        Args:
+            element (HTMLElement): changed HTML element
+        """
+        element.attrs_html = None
+        # Big fragments aren't cached on every element, so an ancestor can be cached
+        # while the elements between them aren't: walk up to the root
+        while element is not None:
+            element.render_cache = None
+            element = element.parent
+
+    @classmethod
+    def get_document(cls, element):
+        """Return the indexes of the given element's document, creating them
+        for an element that is alone in its document
+
+        Args:
+            element (HTMLElement): HTML element
+
+        Returns:
+            DocumentIndex: the document's indexes
+        """
+        if element.document is None:
+            cls.register_elements(element, DocumentIndex())
+        return element.document
+
+    @classmethod
+    def register_elements(cls, element, document):
+        """Make every element of the given subtree share the document's indexes and index them
+
+        Args:
+            element (HTMLElement): root of the subtree
+            document (DocumentIndex): the document's indexes
+        """
+        for elem in cls.iter_subtree(element):
+            elem.document = document
+            cls.index_element(document, elem)
+
+    @classmethod
+    def index_element(cls, document, elem):
+        """Add an element to the document's indexes
+
+        Args:
+            document (DocumentIndex): the document's indexes
+            elem (HTMLElement): HTML element
+        """
+        if elem.elem_id is not None:
+            document.ids[elem.elem_id] = elem
+        document.tags.setdefault(elem.tag_name, {})[elem] = None
+        for attr_key, attr_val in (elem._attrs or {}).items():
+            document.attr_names.setdefault(attr_key, {})[elem] = None
+            if attr_key == 'class' and isinstance(attr_val, str):
+                for class_name in attr_val.split():
+                    document.classes.setdefault(class_name, {})[elem] = None
+            try:
+                document.attrs.setdefault((attr_key, attr_val), {})[elem] = None
+            except TypeError:
+                # Unhashable values aren't indexed, find_elements_by_attr() walks the tree for them
+                pass
+
+    @classmethod
+    def unindex_element(cls, document, elem):
+        """Remove an element from the document's indexes
+
+        Args:
+            document (DocumentIndex): the document's indexes
+            elem (HTMLElement): HTML element
+        """
+        if elem.elem_id is not None and document.ids.get(elem.elem_id) is elem:
+            del document.ids[elem.elem_id]
+        keys = [(document.tags, elem.tag_name)]
+        for attr_key, attr_val in (elem._attrs or {}).items():
+            keys.append((document.attr_names, attr_key))
+            if attr_key == 'class' and isinstance(attr_val, str):
+                keys.extend((document.classes, class_name) for class_name in attr_val.split())
+            try:
+                hash(attr_val)
+            except TypeError:
+                continue
+            keys.append((document.attrs, (attr_key, attr_val)))
+
+        for index, key in keys:
+            if (elements := index.get(key)) is not None:
+                elements.pop(elem, None)
+                if not elements:
+                    del index[key]
+
+    @classmethod
+    def iter_subtree(cls, element):
+        """Yield the given element and all the HTML elements under it
+
+        Args:
+            element (HTMLElement): root of the subtree
+
+        Yields:
+            HTMLElement: elements of the subtree
+        """
+        stack = [element]
+        while stack:
+            elem = stack.pop()
+            yield elem
+            stack.extend(child for child in reversed(elem.value) if not isinstance(child, str))
+
+    @classmethod
+    def get_element_by_id(cls, element, id_val):
+        """ Return the element having the given id in the whole document of the given element,
+        looked up in the document's id registry in O(1)
+
+        Args:
+            element (HTMLElement): any HTML element of the document
+            id_val (str): id attribute value
+
+        Returns:
+            HTMLElement | None: the element having id_val, None when there isn't one
+        """
+        return cls.get_document(element).ids.get(id_val)
+
+    @classmethod
+    @instrumented(size=lambda args, result: len(result or ''))
+    def render(cls, element, level=0, minify=False):
+        """ Traverse the given element to create HTML DOM syntax.
+        Subtrees rendered before and not changed since are taken from the render cache
 
         Args:
             element (HTMLElement | str | list): HTML element to start traverse from
             level (int, optional): HTML Element level in tree. Defaults to 0.
+            minify (bool, optional): render without indentation and newlines. Defaults to False.
 
         Returns:
             str: HTML syntax tree
@@ -126,44 +599,314 @@ class HTMLElement:
         if not element:
             return None
 
-        indentation = ' '*4*level
-        html = ''
+        html = cls.render_fragment(element, None if minify else level)
         if level == 0:
-            html += "<!DOCTYPE html>\n"
-        html += f'{indentation}<{element.tag_name}'
+            html = ("<!DOCTYPE html>" if minify else "<!DOCTYPE html>\n") + html
+            print(html)
+        return html
+
+    @classmethod
+    def render_fragment(cls, element, level=0):
+        """ Return HTML syntax of the given element without the doc type,
+        caching it on the rendered elements for their level.
+        The tree is traversed with an explicit stack, so deep documents don't hit
+        the recursion limit
+
+        Args:
+            element (HTMLElement): HTML element to start traverse from
+            level (int | None, optional): HTML Element level in tree, None to render
+                without indentation and newlines. Defaults to 0.
+
+        Returns:
+            str: HTML syntax tree
+        """
+        if (html := cls.cached_render(element, level)) is not None:
+            return html
+        cls.render_cache_stats['misses'] += 1
+
+        # Parts of the whole fragment, an element's parts are joined when it's cached
+        html = [cls.render_open_tag(element, level)]
+        length = len(html[0])
+        # (element, level, index of its first part, length before it, children left to render)
+        stack = [(element, level, 0, 0, iter(element.value))]
+        while True:
+            elem, elem_level, start, start_length, children = stack[-1]
+            for child in children:
+                if isinstance(child, str):
+                    html.append(child)
+                    length += len(child)
+                    continue
+                child_level = None if elem_level is None else elem_level+1
+                if child_level is not None:
+                    html.append('\n')
+                    length += 1
+                if (child_html := cls.cached_render(child, child_level)) is not None:
+                    html.append(child_html)
+                    length += len(child_html)
+                    continue
+                cls.render_cache_stats['misses'] += 1
+                stack.append((child, child_level, len(html), length, iter(child.value)))
+                html.append(cls.render_open_tag(child, child_level))
+                length += len(html[-1])
+                break
+            else:
+                html.append(cls.render_close_tag(elem, elem_level))
+                length += len(html[-1])
+                stack.pop()
+                if stack and length - start_length > RENDER_CACHE_LIMIT:
+                    continue
+                html[start:] = [''.join(html[start:])]
+                if elem.render_cache is None:
+                    elem.render_cache = {}
+                elem.render_cache[elem_level] = html[-1]
+                if not stack:
+                    return html[0]
+
+    @classmethod
+    def cached_render(cls, element, level):
+        """ Return the cached HTML syntax of the given element for a level
+
+        Args:
+            element (HTMLElement): HTML element
+            level (int | None): HTML Element level in tree, None for the minified syntax
+
+        Returns:
+            str | None: HTML syntax, None when it isn't cached
+        """
+        if element.render_cache and (html := element.render_cache.get(level)) is not None:
+            cls.render_cache_stats['hits'] += 1
+            return html
+        return None
+
+    @classmethod
+    def render_open_tag(cls, element, level):
+        """ Return the indented opening tag of the given element with its attributes.
+        The attributes are serialized once and kept on the element until it's invalidated
+
+        Args:
+            element (HTMLElement): HTML element
+            level (int | None): HTML Element level in tree, None for no indentation
+
+        Returns:
+            str: opening tag
+        """
+        if element.attrs_html is None:
+            element.attrs_html = ''.join(f" {key}='{val}'"
+                                         if isinstance(val, str) else f" {key}={val}"
+                                         for key, val in (element._attrs or {}).items())
+        if level is None:
+            return f"<{element.tag_name}{element.attrs_html}>"
+        return f"{' '*4*level}<{element.tag_name}{element.attrs_html}>"
+
+    @classmethod
+    def render_close_tag(cls, element, level):
+        """ Return the closing tag of the given element, indented when it has child elements
 
-        if element.attrs:
-            html +=''.join(f" {key}='{val}'"
-                    if isinstance(val, str) else f" {key}={val}"
-                        for key, val in element.attrs.items())
+        Args:
+            element (HTMLElement): HTML element
+            level (int | None): HTML Element level in tree, None for no indentation and newline
 
-        html+= '>'
-        for child in element.value:
-            html+= f'{child}' if isinstance(child, str) else f'\n{cls.render(child, level+1)}'
+        Returns:
+            str: closing tag
+        """
+        if level is None:
+            return f'</{element.tag_name}>'
         if len(element.value) >= 1 and isinstance(element.value[0], cls):
-            html += f'{indentation}</{element.tag_name}>\n'
-        else:
-            html += f'</{element.tag_name}>\n'
+            return f"{' '*4*level}</{element.tag_name}>\n"
+        return f'</{element.tag_name}>\n'
+
+    @classmethod
+    def iter_render(cls, element, level=0, minify=False):
+        """ Traverse the given element with an explicit stack yielding HTML DOM syntax
+        chunk by chunk, so the document never has to be held in memory as a whole.
+        Cached subtrees are yielded from the render cache, nothing new is cached
+
+        Args:
+            element (HTMLElement): HTML element to start traverse from
+            level (int, optional): HTML Element level in tree. Defaults to 0.
+            minify (bool, optional): render without indentation and newlines. Defaults to False.
+
+        Yields:
+            str: HTML syntax chunks, joined they are equal to render()'s output
+        """
+        if not element:
+            return
 
         if level == 0:
-            print(html)
-        return html
+            yield "<!DOCTYPE html>" if minify else "<!DOCTYPE html>\n"
+        if minify:
+            level = None
+        if (html := cls.cached_render(element, level)) is not None:
+            yield html
+            return
+
+        yield cls.render_open_tag(element, level)
+        stack = [(element, level, iter(element.value))]
+        while stack:
+            elem, elem_level, children = stack[-1]
+            for child in children:
+                if isinstance(child, str):
+                    yield child
+                    continue
+                child_level = None if elem_level is None else elem_level+1
+                if child_level is not None:
+                    yield '\n'
+                if (html := cls.cached_render(child, child_level)) is not None:
+                    yield html
+                    continue
+                yield cls.render_open_tag(child, child_level)
+                stack.append((child, child_level, iter(child.value)))
+                break
+            else:
+                stack.pop()
+                yield cls.render_close_tag(elem, elem_level)
 
     @classmethod
-    def render_html_file(cls, element, file_name):
-        """ Render HTML syntax created into an html file
+    def render_to(cls, element, stream, buffer_size=RENDER_BUFFER_SIZE, minify=False,
+                  compression=None):
+        """ Write HTML syntax of the given element into a text stream while traversing it,
+        or compress it into a binary stream
+
+        Args:
+            element (HTMLElement): HTML element to start traverse from
+            stream (text stream | binary stream): writable stream, binary when compressing
+            buffer_size (int, optional): number of characters collected before each write
+            minify (bool, optional): render without indentation and newlines. Defaults to False.
+            compression (str, optional): a COMPRESSORS name. Defaults to None.
+
+        Raises:
+            ValueError: Raise when the compression isn't available
+        """
+        if compression:
+            # Closing the compressed stream flushes it, the given stream is left open
+            with cls.open_output(stream, compression) as text_stream:
+                cls.render_to(element, text_stream, buffer_size, minify)
+            return
+
+        buffer = []
+        buffered = 0
+        for chunk in cls.iter_render(element, minify=minify):
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= buffer_size:
+                stream.write(''.join(buffer))
+                buffer.clear()
+                buffered = 0
+        stream.write(''.join(buffer))
+
+    @classmethod
+    def render_html_file(cls, element, file_name, minify=False, compression=None):
+        """ Render HTML syntax created into an html file, writing it while traversing the element
 
         Args:
             element (HTMLElement)
+            file_name (str): html file path
+            minify (bool, optional): render without indentation and newlines. Defaults to False.
+            compression (str, optional): a COMPRESSORS name to compress the file with,
+                like index.html.gz for 'gzip'. Defaults to None.
+
+        Raises:
+            ValueError: Raise when the compression isn't available
         """
         try:
-            with open(file_name, 'w', encoding = 'utf-8') as file:
-                file.write(cls.render(element))
+            with cls.open_output(file_name, compression) as file:
+                cls.render_to(element, file, minify=minify)
 
         except (FileNotFoundError, IOError) as error:
             print(f"{type(error)}: {error}")
 
     @classmethod
+    def open_output(cls, file_or_stream, compression=None):
+        """ Open a text stream writing utf-8 into a file, compressed when asked to
+
+        Args:
+            file_or_stream (str | binary stream): file path, or a binary stream when compressing
+            compression (str, optional): a COMPRESSORS name. Defaults to None.
+
+        Raises:
+            ValueError: Raise when the compression isn't available
+
+        Returns:
+            text stream: writable stream, closing it doesn't close a given binary stream
+        """
+        if not compression:
+            return open(file_or_stream, 'w', encoding='utf-8')
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression {compression!r}, use one of {list(COMPRESSORS)}")
+        return COMPRESSORS[compression](file_or_stream, 'wt', encoding='utf-8')
+
+    @classmethod
+    def render_many(cls, docs_or_factories, out_dir, workers=None, minify=False,
+                    compression=None):
+        """ Render many independent documents into html files of out_dir using a process pool.
+        Every worker builds (for factories), renders and writes its documents, streaming them
+        to disk. A failing document is reported without stopping the others
+
+        Args:
+            docs_or_factories (dict | iterable): documents, or functions without arguments
+                returning a document, keyed by file name. An iterable is named
+                document_<index>.html. Factories are cheaper to send to the workers than
+                built documents and must be picklable (defined at module level)
+            out_dir (str): output directory, created when missing
+            workers (int, optional): number of processes, 1 renders in this process,
+                None uses one process per cpu
+            minify (bool, optional): render without indentation and newlines. Defaults to False.
+            compression (str, optional): a COMPRESSORS name to compress the files with.
+                Defaults to None.
+
+        Returns:
+            dict: file path -> error message, for the documents that failed
+        """
+        if isinstance(docs_or_factories, dict):
+            items = iter(docs_or_factories.items())
+        else:
+            items = ((f'document_{index}.html', doc)
+                     for index, doc in enumerate(docs_or_factories))
+        os.makedirs(out_dir, exist_ok=True)
+        tasks = ((os.path.join(out_dir, file_name), doc) for file_name, doc in items)
+
+        failures = {}
+        if workers == 1:
+            for file_path, doc in tasks:
+                if (error := render_document(file_path, doc, minify, compression)) is not None:
+                    failures[file_path] = error
+            return failures
+
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Only a bounded number of documents are in flight, so the batch is never held
+            # in memory as a whole
+            pending = {}
+            for file_path, doc in tasks:
+                pending[executor.submit(render_document, file_path, doc, minify,
+                                        compression)] = file_path
+                if len(pending) >= workers * RENDER_MANY_BACKLOG:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    cls.collect_failures(done, pending, failures)
+            cls.collect_failures(wait(pending)[0], pending, failures)
+        return failures
+
+    @classmethod
+    def collect_failures(cls, done, pending, failures):
+        """ Record the errors of finished render_many() tasks
+
+        Args:
+            done (set): finished futures
+            pending (dict): future -> file path of the tasks in flight, done ones are removed
+            failures (dict): file path -> error message
+        """
+        for future in done:
+            file_path = pending.pop(future)
+            try:
+                error = future.result()
+            # Documents that can't be sent to a worker fail here
+            except Exception as exception:  # pylint: disable=broad-except
+                error = f"{type(exception)}: {exception}"
+            if error is not None:
+                failures[file_path] = error
+
+    @classmethod
+    @instrumented(size=lambda args, result: len(result))
     def find_elements_by_attr(cls, elem, attr_key, attr_val):
         """ Returns all html elements having the same attribute value for a specific key attribute
 
@@ -178,18 +921,34 @@ class HTMLElement:
         Returns:
             list: list of HTML elements
         """
-        if not isinstance(elem, HTMLElement):
-            return []
-        list_elem = []
-        if (attr_key, attr_val) in elem.attrs.items():
-            list_elem.append(elem)
+        return list(cls.iter_elements_by_attr(elem, attr_key, attr_val))
 
-        for child in elem.value:
-            if not isinstance(child, str):
-                list_elem.extend(cls.find_elements_by_attr(child, attr_key, attr_val))
-        return list_elem
+    @classmethod
+    def iter_elements_by_attr(cls, elem, attr_key, attr_val):
+        """ Lazily yield the html elements of the given element's subtree having the same
+        attribute value for a specific key attribute, in document order
+
+        Args:
+            elem (HTMLElement): HTML element
+            attr_key (str): attribute key
+            attr_val (str | number): attribute value
+
+        Yields:
+            HTMLElement: matching elements
+        """
+        if not isinstance(elem, HTMLElement):
+            return
+        try:
+            candidates = cls.get_document(elem).attrs.get((attr_key, attr_val))
+        except TypeError:
+            # Unhashable values aren't indexed
+            yield from (child for child in cls.iter_subtree(elem)
+                        if child._attrs and (attr_key, attr_val) in child._attrs.items())
+            return
+        yield from cls.iter_candidates(elem, candidates)
 
     @classmethod
+    @instrumented(size=lambda args, result: len(result))
     def find_elements_by_id(cls, elem, id_val):
         """ Returns all html elements having id attribute
 
@@ -203,6 +962,7 @@ class HTMLElement:
         return cls.find_elements_by_attr(elem, 'id', id_val)
 
     @classmethod
+    @instrumented(size=lambda args, result: len(result))
     def find_elements_by_tag_name(cls, element, name):
         """ Return HTML elements having the same tag name
 
@@ -213,11 +973,334 @@ class HTMLElement:
         Returns:
             list: list of HTML elements
         """
-        list_elem = []
-        if name == element.tag_name:
-            list_elem.append(element)
+        return list(cls.iter_elements_by_tag_name(element, name))
 
-        for child in element.value:
-            if not isinstance(child, str):
-                list_elem.extend(cls.find_elements_by_tag_name(child, name))
-        return list_elem
+    @classmethod
+    def iter_elements_by_tag_name(cls, element, name):
+        """ Lazily yield the html elements of the given element's subtree having the same
+        tag name, in document order
+
+        Args:
+            element (HTMLElement): HTML element
+            name (string): HTML element tag name
+
+        Yields:
+            HTMLElement: matching elements
+        """
+        yield from cls.iter_candidates(element, cls.get_document(element).tags.get(name))
+
+    @classmethod
+    def find_first(cls, element, query):
+        """ Return the first element of the given element's subtree (itself included), in document
+        order, matching a query. The traversal stops at the first match
+
+        Args:
+            element (HTMLElement): HTML element
+            query (str | callable): CSS selector, or a function taking an element
+                and returning True when it matches
+
+        Raises:
+            ValueError: Raise when the selector is invalid or not supported
+
+        Returns:
+            HTMLElement | None: the first matching element, None when there isn't one
+        """
+        if callable(query):
+            return next((elem for elem in cls.iter_subtree(element) if query(elem)), None)
+
+        chains = parse_selector(query)
+        return next((elem for elem in cls.iter_subtree(element)
+                     if cls.matches_selector(elem, chains)), None)
+
+    @classmethod
+    def matches_selector(cls, elem, chains):
+        """ Check whether an element matches a parsed CSS selector, looking at its ancestors only
+
+        Args:
+            elem (HTMLElement): HTML element
+            chains (list): parse_selector() output
+
+        Returns:
+            bool: True when the element matches one of the selector groups
+        """
+        return any(cls.matches_compound(elem, chain[-1][1])
+                   and cls.matches_chain(elem, chain, len(chain) - 1) for chain in chains)
+
+    @classmethod
+    def iter_candidates(cls, element, candidates):
+        """ Yield the indexed candidates that are inside the given element's subtree,
+        in document order. A few candidates are sorted by their paths, more by
+        their pre-order numbers, numbering the document first when it changed since
+        the last time, so only the first big query after a change walks the document
+
+        Args:
+            element (HTMLElement): root of the subtree
+            candidates (dict | None): HTML elements of the element's document
+
+        Yields:
+            HTMLElement: candidates of the subtree
+        """
+        if not candidates:
+            return
+        if len(candidates) <= SORTED_CANDIDATES_LIMIT:
+            yield from cls.in_document_order(element, candidates)
+            return
+
+        if not element.document.numbered:
+            cls.number_elements(element)
+        # The subtree's elements are numbered from the element to its last descendant
+        first = last = element
+        while (child := next((child for child in reversed(last.value)
+                              if not isinstance(child, str)), None)) is not None:
+            last = child
+        start, end = first.order, last.order
+        yield from sorted((elem for elem in candidates if start <= elem.order <= end),
+                          key=ORDER_KEY)
+
+    @classmethod
+    def number_elements(cls, element):
+        """ Number every element of the given element's document in pre-order
+
+        Args:
+            element (HTMLElement): any HTML element of the document
+        """
+        root = element
+        # The parser links elements being built to ancestors outside of their document
+        while root.parent is not None and root.parent.document is element.document:
+            root = root.parent
+        for order, elem in enumerate(cls.iter_subtree(root)):
+            elem.order = order
+        root.document.numbered = True
+
+    @classmethod
+    def in_document_order(cls, element, candidates):
+        """ Keep the candidates inside the given element's subtree, sorted in document order
+        (the order a recursive traversal from the element visits them)
+
+        Args:
+            element (HTMLElement): root of the subtree
+            candidates (iterable): HTML elements of the element's document
+
+        Returns:
+            list: list of HTML elements
+        """
+        keyed = []
+        for candidate in candidates:
+            path = []
+            node = candidate
+            while node is not element:
+                if node.parent is None:
+                    break
+                path.append(node.position)
+                node = node.parent
+            else:
+                keyed.append((path[::-1], candidate))
+        keyed.sort(key=lambda item: item[0])
+        return [candidate for _, candidate in keyed]
+
+    @classmethod
+    def select(cls, element, selector):
+        """ Return HTML elements of the given element's subtree (itself included) matching
+        a CSS selector, in document order. Supported: tag, *, #id, .class, [attr], [attr=value],
+        descendant and child (>) combinators, and comma separated groups.
+        Attribute values are compared as strings.
+        Candidates come from the most selective document index of the rightmost compound
+        selector, then their ancestors are checked for the rest of the selector
+
+        Args:
+            element (HTMLElement): HTML element
+            selector (str): CSS selector
+
+        Raises:
+            ValueError: Raise when the selector is invalid or not supported
+
+        Returns:
+            list: list of HTML elements
+        """
+        found = {}
+        for chain in parse_selector(selector):
+            compound = chain[-1][1]
+            candidates = cls.select_candidates(element, compound)
+            for candidate in cls.iter_subtree(element) if candidates is None else candidates:
+                if cls.matches_compound(candidate, compound) \
+                        and cls.matches_chain(candidate, chain, len(chain) - 1):
+                    found[candidate] = None
+        return list(cls.iter_candidates(element, found))
+
+    @classmethod
+    def select_candidates(cls, element, compound):
+        """ Plan a selector query: return the smallest indexed set of elements
+        that can match the compound selector
+
+        Args:
+            element (HTMLElement): HTML element
+            compound (tuple): tag, ids, class names and attributes of a compound selector
+
+        Returns:
+            dict | None: candidate elements, None when no index applies (only * is used)
+        """
+        document = cls.get_document(element)
+        tag, ids, class_names, attrs = compound
+        options = [{document.ids[id_val]: None} if id_val in document.ids else {}
+                   for id_val in ids]
+        options.extend(document.classes.get(class_name, {}) for class_name in class_names)
+        for attr_key, attr_val in attrs:
+            if attr_val is None:
+                options.append(document.attr_names.get(attr_key, {}))
+                continue
+            # Numbers are stored as numbers, look the number up too
+            elements = dict(document.attrs.get((attr_key, attr_val), {}))
+            for convert in (int, float):
+                try:
+                    elements.update(document.attrs.get((attr_key, convert(attr_val)), {}))
+                except ValueError:
+                    pass
+            options.append(elements)
+        if tag not in (None, '*'):
+            options.append(document.tags.get(tag, {}))
+        return min(options, key=len) if options else None
+
+    @classmethod
+    def matches_compound(cls, elem, compound):
+        """ Check whether an element matches a compound selector
+
+        Args:
+            elem (HTMLElement): HTML element
+            compound (tuple): tag, ids, class names and attributes of a compound selector
+
+        Returns:
+            bool: True when the element matches
+        """
+        tag, ids, class_names, attrs = compound
+        if tag not in (None, '*') and elem.tag_name != tag:
+            return False
+        if any(elem.elem_id != id_val for id_val in ids):
+            return False
+        elem_attrs = elem._attrs or {}
+        if class_names and not set(class_names) <= set(str(elem_attrs.get('class', '')).split()):
+            return False
+        return all(attr_key in elem_attrs and (attr_val is None
+                                               or str(elem_attrs[attr_key]) == attr_val)
+                   for attr_key, attr_val in attrs)
+
+    @classmethod
+    def matches_chain(cls, elem, chain, index):
+        """ Check, from right to left, that the ancestors of an element matching chain[index]
+        match the compound selectors before it
+
+        Args:
+            elem (HTMLElement): HTML element matching chain[index]
+            chain (list): (combinator, compound selector) pairs of a selector group
+            index (int): index of the compound selector matched by elem
+
+        Returns:
+            bool: True when the whole chain matches
+        """
+        if index == 0:
+            return True
+        combinator = chain[index][0]
+        compound = chain[index - 1][1]
+        ancestor = elem.parent
+        while ancestor is not None:
+            if cls.matches_compound(ancestor, compound) \
+                    and cls.matches_chain(ancestor, chain, index - 1):
+                return True
+            if combinator == '>':
+                return False
+            ancestor = ancestor.parent
+        return False
+
+
+def render_document(file_path, doc, minify=False, compression=None):
+    """ Build, render and write one document of HTMLElement.render_many(),
+    runs inside a worker process
+
+    Args:
+        file_path (str): html file path
+        doc (HTMLElement | callable): document, or function without arguments returning it
+        minify (bool, optional): render without indentation and newlines. Defaults to False.
+        compression (str, optional): a COMPRESSORS name. Defaults to None.
+
+    Returns:
+        str | None: error message, None when the document was written
+    """
+    try:
+        if callable(doc):
+            doc = doc()
+        with HTMLElement.open_output(file_path, compression) as file:
+            HTMLElement.render_to(doc, file, minify=minify)
+    # Any error of a document, built by user code, must not stop the batch
+    except Exception as error:  # pylint: disable=broad-except
+        return f"{type(error)}: {error}"
+    return None
+
+def parse_selector(selector):
+    """ Parse a CSS selector into selector groups
+
+    Args:
+        selector (str): CSS selector
+
+    Raises:
+        ValueError: Raise when the selector is invalid or not supported
+
+    Returns:
+        list: one list of (combinator, compound selector) pairs per comma separated group,
+        the combinator is ' ' (descendant), '>' (child) or None for the first compound selector
+    """
+    groups = [[]]
+    combinator = None
+    position = 0
+    selector = selector.strip()
+    while position < len(selector):
+        token = SELECTOR_TOKEN.match(selector, position)
+        if not token:
+            raise ValueError(f"Invalid selector {selector!r}")
+        position = token.end()
+        if token['compound']:
+            if groups[-1] and combinator is None:
+                raise ValueError(f"Invalid selector {selector!r}")
+            groups[-1].append((combinator, parse_compound(token['compound'], selector)))
+            combinator = None
+        elif token['combinator'] == ',':
+            if not groups[-1] or combinator == '>':
+                raise ValueError(f"Invalid selector {selector!r}")
+            groups.append([])
+            combinator = None
+        elif token['combinator'] == '>' or combinator is None and groups[-1]:
+            if not groups[-1] or combinator == '>':
+                raise ValueError(f"Invalid selector {selector!r}")
+            combinator = token['combinator'] or ' '
+    if not groups[-1] or combinator == '>':
+        raise ValueError(f"Invalid selector {selector!r}")
+    return groups
+
+
+def parse_compound(compound, selector):
+    """ Parse a compound selector like div.class#id[attr=value]
+
+    Args:
+        compound (str): compound selector
+        selector (str): the whole selector, for error messages
+
+    Raises:
+        ValueError: Raise when the compound selector is invalid
+
+    Returns:
+        tuple: tag (or None), ids, class names and (attribute key, value or None) pairs
+    """
+    tag, ids, class_names, attrs = None, [], [], []
+    position = 0
+    while position < len(compound):
+        simple = SIMPLE_SELECTOR.match(compound, position)
+        if not simple or simple['tag'] and position:
+            raise ValueError(f"Invalid selector {selector!r}")
+        position = simple.end()
+        if simple['tag']:
+            tag = simple['tag']
+        elif simple['id']:
+            ids.append(simple['id'])
+        elif simple['class_name']:
+            class_names.append(simple['class_name'])
+        else:
+            attrs.append((simple['attr'], simple['attr_val']))
+    return tag, ids, class_names, attrs
@@ -0,0 +1,291 @@
+''' This module parses html into HTMLElement trees, whole or streaming the matching subtrees '''
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from .html_framework import HTMLElement, parse_selector
+
+
+# Number of characters fed to the parser at a time when reading a file
+PARSE_CHUNK_SIZE = 1 << 16
+# Elements that never have content nor an end tag in html
+VOID_ELEMENTS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+                           'meta', 'param', 'source', 'track', 'wbr'])
+# Elements whose start tag closes an open element of the listed tags (the HTML implied end tags),
+# looking from the innermost open element until one of the scope boundaries
+LIST_ITEM_TAGS = ({'li'}, {'ul', 'ol', 'menu'})
+DEFINITION_TAGS = ({'dt', 'dd'}, {'dl'})
+CELL_TAGS = ({'td', 'th'}, {'tr', 'table'})
+PARAGRAPH_TAGS = ({'p'}, {'button', 'caption', 'html', 'object', 'table', 'td', 'template', 'th'})
+IMPLIED_END_TAGS = {
+    'li': LIST_ITEM_TAGS, 'dt': DEFINITION_TAGS, 'dd': DEFINITION_TAGS,
+    'td': CELL_TAGS, 'th': CELL_TAGS,
+    'tr': ({'tr'}, {'table', 'thead', 'tbody', 'tfoot'}),
+    'option': ({'option'}, {'select', 'datalist', 'optgroup'}),
+    # Block elements close an open paragraph
+    **dict.fromkeys(['address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl',
+                     'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3',
+                     'h4', 'h5', 'h6', 'header', 'hr', 'main', 'menu', 'nav', 'ol', 'p',
+                     'pre', 'section', 'table', 'ul'], PARAGRAPH_TAGS),
+}
+# Unquoted numeric attribute values, rendered back as numbers like render() does for int values
+NUMBER_ATTR = re.compile(r'\s([^\s"\'>/=]+)\s*=\s*(-?\d+)(?=[\s/>])')
+# Newline and indentation render() writes before a child element
+CHILD_INDENTATION = re.compile(r'\n *$')
+# Indentation render() writes before the closing tag of an element starting with a child element
+TRAILING_SPACES = re.compile(r' +$')
+
+
+class HTMLElementParser(HTMLParser):
+    """ Build HTMLElement trees from html fed in chunks. Only the subtrees whose root
+    matches a filter are built, the other elements are dropped once their end tag is parsed,
+    so memory is bounded by the biggest matching subtree and the depth of the document.
+    The doc type, comments, processing instructions and text outside of the matching subtrees
+    are skipped. Text and entities are kept as written, whitespace included, and attribute
+    values are kept escaped. For html written
+    by render(), the newlines and indentation it writes around child elements can be dropped,
+    so parsing it and rendering it again gives the same html
+    """
+
+    def __init__(self, match=None, rendered=False):
+        """ Construct all the necessary attributes for the HTMLElementParser object
+
+        Args:
+            match (str | callable, optional): CSS selector, or a function taking an element
+                (without its content yet, its ancestors are set) and returning True when its
+                subtree should be built. None builds every top level element. Defaults to None.
+            rendered (bool, optional): drop the whitespace render() writes around child
+                elements and rely on its end tags instead of closing elements implicitly.
+                Only for html written by render(), it drops whitespace only text
+                between elements. Defaults to False.
+
+        Raises:
+            ValueError: Raise when the selector is invalid or not supported
+        """
+        super().__init__(convert_charrefs=False)
+        if isinstance(match, str):
+            chains = parse_selector(match)
+            match = lambda elem: HTMLElement.matches_selector(elem, chains)
+        self.match = match
+        self.rendered = rendered
+        # Open elements, from the top level one to the innermost one
+        self.open_elements = []
+        # Index in open_elements of the root of the subtree being built, None outside of it
+        self.capture_index = None
+        # Built subtrees not yet handed out by pop_completed()
+        self.completed = []
+
+    def handle_starttag(self, tag, attrs):
+        """ Create the element of a start tag
+
+        Args:
+            tag (str): lower case tag name
+            attrs (list): (name, value) pairs, value is None for attributes without one
+
+        Raises:
+            TagNameError: Raise custom exception when having invalid tag name
+            SameIdException: Raise custom exception when having elements with the same id value
+        """
+        # render() writes every end tag, even for elements HTML would close implicitly
+        if not self.rendered:
+            self.close_implied(tag)
+        # html.parser unescapes attribute values, they are escaped again like the text is kept,
+        # since render() writes them as they are
+        attrs = {name: '' if value is None else escape(value) for name, value in attrs}
+        for name, number in NUMBER_ATTR.findall(self.get_starttag_text()):
+            # Numbers with leading zeros like 02134 stay strings, int() would drop the zeros
+            if attrs.get(name.lower()) == number and str(int(number)) == number:
+                attrs[name.lower()] = int(number)
+        elem = HTMLElement(tag, attrs)
+
+        if self.capture_index is not None:
+            if self.rendered:
+                self.strip_text(self.open_elements[-1], CHILD_INDENTATION)
+            HTMLElement.append(self.open_elements[-1], elem)
+        else:
+            # Ancestors are linked without holding their children, for selectors like 'div > p'
+            elem.parent = self.open_elements[-1] if self.open_elements else None
+            if self.match is not None and not self.match(elem):
+                if tag not in VOID_ELEMENTS:
+                    self.open_elements.append(elem)
+                return
+            self.capture_index = len(self.open_elements)
+
+        self.open_elements.append(elem)
+        if tag in VOID_ELEMENTS:
+            self.close_elements(len(self.open_elements) - 1)
+
+    def handle_endtag(self, tag):
+        """ Close the innermost open element of an end tag and the elements opened inside it,
+        an end tag without an open element is ignored
+
+        Args:
+            tag (str): lower case tag name
+        """
+        for index in range(len(self.open_elements) - 1, -1, -1):
+            element = self.open_elements[index]
+            if element.tag_name == tag:
+                # Indentation of a closing tag written on its own line
+                if self.rendered and self.capture_index is not None and element.value \
+                        and not isinstance(element.value[0], str):
+                    self.strip_text(element, TRAILING_SPACES)
+                self.close_elements(index)
+                return
+
+    def close_implied(self, tag):
+        """ Close the open element a start tag implies the end of, like an open li
+        when the next li of the same list starts
+
+        Args:
+            tag (str): lower case tag name of the start tag
+        """
+        closed, boundaries = IMPLIED_END_TAGS.get(tag, ((), ()))
+        for index in range(len(self.open_elements) - 1, -1, -1):
+            tag_name = self.open_elements[index].tag_name
+            if tag_name in closed:
+                self.close_elements(index)
+                return
+            if tag_name in boundaries:
+                return
+
+    def handle_data(self, data):
+        """ Add text to the element being built
+
+        Args:
+            data (str): text
+        """
+        if self.capture_index is None:
+            return
+        element = self.open_elements[-1]
+        if self.rendered:
+            if element.value and not isinstance(element.value[-1], str):
+                # The newline render() writes after the closing tag of a child element
+                data = data[1:] if data.startswith('\n') else data
+            if not data.strip():
+                return
+        if element.value and isinstance(element.value[-1], str):
+            element.value[-1] += data
+            HTMLElement.invalidate(element)
+        else:
+            HTMLElement.append(element, data)
+
+    def handle_entityref(self, name):
+        """ Keep a named character reference like &amp; as written
+
+        Args:
+            name (str): entity name
+        """
+        self.handle_data(f'&{name};')
+
+    def handle_charref(self, name):
+        """ Keep a numeric character reference like &#62; as written
+
+        Args:
+            name (str): code point, x prefixed for hexadecimal
+        """
+        self.handle_data(f'&#{name};')
+
+    def strip_text(self, element, pattern):
+        """ Remove render() formatting from the end of the element's last text,
+        dropping the text when nothing else is left, for html written by render()
+
+        Args:
+            element (HTMLElement): HTML element being built
+            pattern (re.Pattern): formatting at the end of the text
+        """
+        if not element.value or not isinstance(element.value[-1], str):
+            return
+        text = pattern.sub('', element.value[-1])
+        if text.strip():
+            element.value[-1] = text
+        else:
+            element.value.pop()
+        HTMLElement.invalidate(element)
+
+    def close_elements(self, index):
+        """ Close the open elements from index on, completing the subtree being built
+        when its root is closed
+
+        Args:
+            index (int): index in open_elements
+        """
+        root = None
+        if self.capture_index is not None and index <= self.capture_index:
+            root = self.open_elements[self.capture_index]
+            self.capture_index = None
+        del self.open_elements[index:]
+        if root is not None:
+            # Detach the subtree from the ancestors it was matched with
+            root.parent = None
+            self.completed.append(root)
+
+    def pop_completed(self):
+        """ Hand out the subtrees completed so far
+
+        Returns:
+            list: HTMLElement roots of the completed subtrees, in document order
+        """
+        completed, self.completed = self.completed, []
+        return completed
+
+    def close(self):
+        """ Parse what is left and close the elements still open """
+        super().close()
+        if self.open_elements:
+            self.close_elements(0)
+
+
+def iter_parse(source, match=None, chunk_size=PARSE_CHUNK_SIZE, rendered=False):
+    """ Parse html, yielding the subtrees matching a filter as soon as their end tag is parsed.
+    Only one matching subtree and the open ancestors are held in memory at a time
+
+    Args:
+        source (str | text file | iterable): html, a file opened in text mode,
+            or an iterable of html chunks
+        match (str | callable, optional): CSS selector, or a function taking an element
+            and returning True when its subtree should be built. None yields every top level
+            element. Defaults to None.
+        chunk_size (int, optional): number of characters read from a file at a time
+        rendered (bool, optional): drop the whitespace render() writes around child elements,
+            for html written by render(). Defaults to False.
+
+    Raises:
+        TagNameError: Raise custom exception when having invalid tag name
+        SameIdException: Raise custom exception when having elements with the same id value
+        ValueError: Raise when the selector is invalid or not supported
+
+    Yields:
+        HTMLElement: root of every matching subtree, in document order
+    """
+    parser = HTMLElementParser(match, rendered)
+    if isinstance(source, str):
+        chunks = [source]
+    elif hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), '')
+    else:
+        chunks = source
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_completed()
+    parser.close()
+    yield from parser.pop_completed()
+
+
+def parse_html(source, rendered=False):
+    """ Parse html into HTMLElement trees
+
+    Args:
+        source (str | text file | iterable): html, a file opened in text mode,
+            or an iterable of html chunks
+        rendered (bool, optional): drop the whitespace render() writes around child elements,
+            for html written by render(). Defaults to False.
+
+    Raises:
+        TagNameError: Raise custom exception when having invalid tag name
+        SameIdException: Raise custom exception when having elements with the same id value
+
+    Returns:
+        list: HTMLElement roots of the top level elements
+    """
+    return list(iter_parse(source, rendered=rendered))
@@ -0,0 +1,34 @@
+""" This module test functionality of the html framework benchmark suite """
+import pytest
+
+from .benchmark_html_framework import SHAPES, find_regressions, parse_size, run_benchmarks
+from .html_framework import HTMLElement
+
+
+@pytest.mark.parametrize('shape', list(SHAPES))
+def test_shapes(shape):
+    """ Ensure that every shape builds a tree of about the requested number of nodes
+    Returns:
+        bool
+    """
+    nodes = sum(1 for _ in HTMLElement.iter_subtree(SHAPES[shape](parse_size('2K'))))
+    assert 2000 <= nodes < 2010
+
+
+def test_run_benchmarks():
+    """ Ensure that every selected case is timed, traced and compared against a baseline
+    Returns:
+        bool
+    """
+    results = run_benchmarks(['100'], shapes=('wide', 'deep'),
+                             cases={'build', 'render', 'find_elements_by_tag_name'}, repeat=1)
+    assert set(results) == {f'{case}/{shape}/100' for shape in ('wide', 'deep')
+                            for case in ('build', 'render', 'find_elements_by_tag_name')}
+    assert all(result['peak_bytes'] is not None for result in results.values())
+
+    baseline = {name: {'seconds': result['seconds'] / 10, 'peak_bytes': result['peak_bytes'],
+                       'nodes': result['nodes']}
+                for name, result in results.items()}
+    assert {name: set(ratios) for name, ratios in find_regressions(results, baseline).items()} \
+        == {name: {'seconds'} for name in results}
+    assert not find_regressions(results, results)
@@ -1,7 +1,15 @@
 """Test positive and negative cases for HTMLElement class methods"""
+import functools
+import gzip
+import io
+import json
+import sys
+
 import pytest
 
 from .html_framework import HTMLElement
+from .html_framework import RENDER_CACHE_LIMIT
+from .html_framework import SORTED_CANDIDATES_LIMIT
 from .html_framework import TagNameError
 from .html_framework import SameIdException
 
@@ -212,3 +220,336 @@ def test_find_elements_by_tag_not_exist(html_tree):
     """
     elements_with_same_tag_name = HTMLElement.find_elements_by_tag_name(html_tree, 'input')
     assert not elements_with_same_tag_name
+
+
+def test_get_element_by_id(html_tree):
+    """Test get_element_by_id() method that should return the element having the id
+    from any element of the document
+
+    Args:
+        html_tree (class): Root of HTML tree
+    """
+    img = HTMLElement.get_element_by_id(html_tree, 'img_id')
+    assert img.tag_name == 'img'
+    assert HTMLElement.get_element_by_id(img, 'div651') is html_tree.value[0]
+    assert HTMLElement.get_element_by_id(html_tree, 'not_exist') is None
+
+
+def test_same_id_in_appended_subtree(html_tree):
+    """Negative test case for append() method that should raise SameIdException custom exception
+       when a nested element of the appended subtree has an id used in the document
+    """
+    subtree = HTMLElement('span', {'id': 'span_id'}, HTMLElement('p', {'id': 'img_id'}))
+    with pytest.raises(SameIdException) as custom_exception:
+        HTMLElement.append(html_tree.value[0], subtree)
+    assert str(custom_exception.value) == \
+    "Shouldn't have same id value img_id for more than one element"
+    assert HTMLElement.get_element_by_id(html_tree, 'span_id') is None
+
+
+def test_remove_frees_ids(html_tree):
+    """Test remove() method that should detach the subtree and free its ids
+
+    Args:
+        html_tree (class): Root of HTML tree
+    """
+    a_elem = HTMLElement.get_element_by_id(html_tree, 'a_id')
+    HTMLElement.remove(html_tree, a_elem)
+    assert a_elem not in html_tree.value
+    assert HTMLElement.get_element_by_id(html_tree, 'img_id') is None
+    assert HTMLElement.get_element_by_id(a_elem, 'img_id') is a_elem.value[0]
+
+    HTMLElement.append(html_tree, HTMLElement('img', {'id': 'img_id'}))
+    with pytest.raises(ValueError):
+        HTMLElement.remove(html_tree, a_elem)
+
+
+def test_render_to_stream(html_tree, expected_str):
+    """Test render_to() and iter_render() methods that should write and yield
+    the same html syntax text as render()
+
+    Args:
+        html_tree (class): Root of HTML tree
+        expected_str (str): expected html syntax text that should be rendered
+    """
+    stream = io.StringIO()
+    HTMLElement.render_to(html_tree, stream, buffer_size=8)
+    assert stream.getvalue() == expected_str
+    assert ''.join(HTMLElement.iter_render(html_tree)) == expected_str
+
+
+def test_render_cache_invalidation(html_tree, expected_str):
+    """Test that a second render is served from the render cache and that append()
+    invalidates only the changed element and its ancestors
+
+    Args:
+        html_tree (class): Root of HTML tree
+        expected_str (str): expected html syntax text that should be rendered
+    """
+    stats = HTMLElement.render_cache_stats
+    HTMLElement.render(html_tree)
+    hits, misses = stats['hits'], stats['misses']
+    assert HTMLElement.render(html_tree) == expected_str
+    assert (stats['hits'], stats['misses']) == (hits + 1, misses)
+
+    p_elem = HTMLElement.get_element_by_id(html_tree, 'pp_id')
+    HTMLElement.append(p_elem, ' there')
+    assert HTMLElement.render(html_tree) == expected_str.replace('>Hi<', '>Hi there<')
+    # root, div651 and p are rendered again, the a element is taken from the cache
+    assert (stats['hits'], stats['misses']) == (hits + 2, misses + 3)
+
+
+def test_compact_element():
+    """Test that elements have no per-instance __dict__, share interned tag names
+    and still accept attributes when created without them
+    """
+    elem = HTMLElement('p')
+    assert not hasattr(elem, '__dict__')
+    assert elem.tag_name is HTMLElement(''.join(['p'])).tag_name
+    assert elem.attrs == {}
+    elem.attrs['class'] = 'p_class'
+    assert HTMLElement.find_elements_by_attr(elem, 'class', 'p_class') == [elem]
+    with pytest.raises(TagNameError):
+        HTMLElement(['p'])
+
+
+@pytest.mark.parametrize('selector, expected_ids', [
+    ('p', ['pp_id']),
+    ('.div_class', ['div1', 'div651', 'pp_id']),
+    ('div > .div_class', ['div651', 'pp_id']),
+    ('#div1 > p', []),
+    ('#div1 p', ['pp_id']),
+    ("a[target='_blank'] img[width=100]", ['img_id']),
+    ('img, [title]', ['div651', 'img_id']),
+    ('*', ['div1', 'div651', 'pp_id', 'a_id', 'img_id']),
+])
+def test_select(html_tree, selector, expected_ids):
+    """Test select() method that should return the elements matching a css selector
+    in document order
+
+    Args:
+        html_tree (class): Root of HTML tree
+        selector (str): css selector
+        expected_ids (list): ids of the expected elements
+    """
+    assert [elem.elem_id for elem in HTMLElement.select(html_tree, selector)] == expected_ids
+
+
+def test_indexes_follow_changes(html_tree):
+    """Test that finders and select() see appended, removed and changed elements
+
+    Args:
+        html_tree (class): Root of HTML tree
+    """
+    a_elem = HTMLElement.get_element_by_id(html_tree, 'a_id')
+    HTMLElement.remove(html_tree, a_elem)
+    assert HTMLElement.select(html_tree, 'img') == []
+    assert HTMLElement.find_elements_by_tag_name(a_elem, 'img') == a_elem.value
+
+    HTMLElement.append(html_tree, HTMLElement('p', {'id': 'last_p'}))
+    HTMLElement.set_attr(html_tree.value[0], 'class', 'changed')
+    assert [elem.elem_id for elem in HTMLElement.find_elements_by_tag_name(html_tree, 'p')] \
+        == ['pp_id', 'last_p']
+    assert [elem.elem_id for elem in HTMLElement.select(html_tree, '.changed p')] == ['pp_id']
+    with pytest.raises(SameIdException):
+        HTMLElement.set_attr(html_tree.value[0], 'id', 'last_p')
+    with pytest.raises(ValueError):
+        HTMLElement.select(html_tree, 'div >')
+
+
+def test_lazy_finders(html_tree):
+    """Test iter_elements_by_attr(), iter_elements_by_tag_name() and find_first() methods
+    that should yield matches lazily in document order
+
+    Args:
+        html_tree (class): Root of HTML tree
+    """
+    class_elems = HTMLElement.iter_elements_by_attr(html_tree, 'class', 'div_class')
+    assert next(class_elems) is html_tree
+    assert [elem.elem_id for elem in class_elems] == ['div651', 'pp_id']
+    assert [elem.elem_id for elem in HTMLElement.iter_elements_by_tag_name(html_tree, 'div')] \
+        == ['div1', 'div651']
+    assert HTMLElement.find_first(html_tree, 'a > img').elem_id == 'img_id'
+    assert HTMLElement.find_first(html_tree, lambda elem: elem.value == ['Hi']).elem_id == 'pp_id'
+    assert HTMLElement.find_first(html_tree, 'span') is None
+
+
+def test_deep_document():
+    """Test that rendering and finding elements in a document deeper than
+    the recursion limit doesn't raise RecursionError
+    """
+    depth = sys.getrecursionlimit() + 100
+    root = node = HTMLElement('div')
+    for _ in range(depth):
+        child = HTMLElement('span', {'class': 'deep'})
+        HTMLElement.append(node, child)
+        node = child
+    HTMLElement.append(node, 'leaf')
+
+    html = HTMLElement.render_fragment(root)
+    assert html.count('<span') == depth
+    assert ''.join(HTMLElement.iter_render(root, 1)) == HTMLElement.render_fragment(root, 1)
+    assert len(HTMLElement.find_elements_by_attr(root, 'class', 'deep')) == depth
+    assert len(HTMLElement.find_elements_by_tag_name(root, 'span')) == depth
+    assert HTMLElement.find_first(root, lambda elem: elem.value == ['leaf']) is node
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_render_many(tmp_path, workers):
+    """Test render_many() method that should write every document and report
+    the failing ones without stopping the batch
+
+    Args:
+        tmp_path (Path): temporary directory
+        workers (int): number of processes
+    """
+    docs = {
+        'built.html': HTMLElement('p', {'id': 'p_id'}, 'Hi'),
+        'factory.html': functools.partial(HTMLElement, 'h1', None, 'Title'),
+        'failing.html': functools.partial(HTMLElement, 'not_a_tag'),
+    }
+    failures = HTMLElement.render_many(docs, tmp_path / 'site', workers=workers)
+    assert list(failures) == [str(tmp_path / 'site' / 'failing.html')]
+    assert 'TagNameError' in failures[str(tmp_path / 'site' / 'failing.html')]
+    assert (tmp_path / 'site' / 'built.html').read_text(encoding='utf-8') \
+        == "<!DOCTYPE html>\n<p id='p_id'>Hi</p>\n"
+    assert (tmp_path / 'site' / 'factory.html').read_text(encoding='utf-8') \
+        == "<!DOCTYPE html>\n<h1>Title</h1>\n"
+
+
+def test_minified_compressed_render(html_tree, tmp_path):
+    """Test minified rendering and gzip compressed output of render_to() and render_html_file()
+
+    Args:
+        html_tree (class): Root of HTML tree
+        tmp_path (Path): temporary directory
+    """
+    minified = HTMLElement.render(html_tree, minify=True)
+    assert minified.startswith("<!DOCTYPE html><div id='div1' class='div_class'><div id='div651'")
+    assert '\n' not in minified and '  ' not in minified
+    assert ''.join(HTMLElement.iter_render(html_tree, minify=True)) == minified
+
+    stream = io.BytesIO()
+    HTMLElement.render_to(html_tree, stream, minify=True, compression='gzip')
+    assert gzip.decompress(stream.getvalue()).decode('utf-8') == minified
+
+    HTMLElement.set_attr(html_tree, 'title', 'root')
+    HTMLElement.render_html_file(html_tree, tmp_path / 'render.html.gz', compression='gzip')
+    with gzip.open(tmp_path / 'render.html.gz', 'rt', encoding='utf-8') as file:
+        assert file.read().startswith(
+            "<!DOCTYPE html>\n<div id='div1' class='div_class' title='root'>")
+    with pytest.raises(ValueError):
+        HTMLElement.render_html_file(html_tree, tmp_path / 'render.html.x', compression='unknown')
+
+
+def test_from_spec(html_tree, expected_str):
+    """Test from_spec() method that should build the same document as the constructors
+    from a JSON template and validate tag names and ids once the tree is built
+
+    Args:
+        html_tree (class): Root of HTML tree
+        expected_str (str): expected html syntax text that should be rendered
+    """
+    spec = json.dumps({'tag_name': 'div', 'attrs': {'id': 'div1', 'class': 'div_class'}, 'val': [
+        {'tag_name': 'div', 'attrs': {'id': 'div651', 'title': 'div2', 'class': 'div_class'},
+         'val': {'tag_name': 'p', 'attrs': {'id': 'pp_id', 'class': 'div_class'}, 'val': 'Hi'}},
+        {'tag_name': 'a', 'attrs': {'href': 'https://google.com', 'id': 'a_id', 'target': '_blank'},
+         'val': [{'tag_name': 'img', 'attrs': {'id': 'img_id', 'border': 0, 'alt': 'Google',
+                                               'src': 'images02.jpg', 'width': 100,
+                                               'height': 100}}]},
+    ]})
+    document = HTMLElement.from_spec(spec)
+    assert HTMLElement.render(document) == expected_str
+    assert HTMLElement.get_element_by_id(document, 'img_id').parent.elem_id == 'a_id'
+    assert [elem.elem_id for elem in HTMLElement.select(document, '.div_class')] \
+        == [elem.elem_id for elem in HTMLElement.select(html_tree, '.div_class')]
+
+    with pytest.raises(TagNameError):
+        HTMLElement.from_spec({'tag_name': 'div', 'val': [{'tag_name': 'not_a_tag'}]})
+    with pytest.raises(SameIdException):
+        HTMLElement.from_spec({'tag_name': 'div', 'attrs': {'id': 'same'},
+                               'val': ['text', {'tag_name': 'p', 'attrs': {'id': 'same'}}]})
+
+
+def test_invalidate_past_uncached_fragment():
+    """Test that a change under an element whose fragment is too big to be cached
+    still drops the cached render of the root
+    """
+    paragraph = HTMLElement('p', val='Hi')
+    section = HTMLElement('section', val=[paragraph, 'x' * (RENDER_CACHE_LIMIT + 1)])
+    root = HTMLElement('div', val=section)
+    HTMLElement.render_fragment(root)
+    assert section.render_cache is None and root.render_cache
+
+    HTMLElement.append(paragraph, 'CHANGED')
+    assert 'HiCHANGED' in HTMLElement.render_fragment(root)
+    assert 'HiCHANGED' in ''.join(HTMLElement.iter_render(root))
+
+
+def test_attrs_changes_follow_indexes():
+    """Test that assigning attrs or changing the attrs dict of an indexed element
+    updates the finders and the cached render
+    """
+    paragraph = HTMLElement('p', {'class': 'old'}, 'Hi')
+    root = HTMLElement('div', {'id': 'root'}, paragraph)
+    assert HTMLElement.find_elements_by_attr(root, 'class', 'old') == [paragraph]
+    HTMLElement.render_fragment(root)
+
+    paragraph.attrs = {'class': 'new', 'id': 'para'}
+    assert HTMLElement.find_elements_by_attr(root, 'class', 'old') == []
+    assert HTMLElement.find_elements_by_id(root, 'para') == [paragraph]
+    assert "class='new'" in HTMLElement.render_fragment(root)
+
+    paragraph.attrs['class'] = 'newer'
+    del paragraph.attrs['id']
+    assert HTMLElement.select(root, 'p.newer') == [paragraph]
+    assert HTMLElement.find_elements_by_id(root, 'para') == []
+    assert "class='newer'" in HTMLElement.render_fragment(root)
+    assert 'para' not in HTMLElement.render_fragment(root)
+
+    with pytest.raises(SameIdException):
+        paragraph.attrs['id'] = 'root'
+    with pytest.raises(SameIdException):
+        paragraph.attrs = {'id': 'root'}
+    assert paragraph.attrs == {'class': 'newer'}
+    assert HTMLElement.find_elements_by_id(root, 'root') == [root]
+
+
+def test_large_candidate_sets_in_document_order():
+    """Test that more than SORTED_CANDIDATES_LIMIT candidates are found in document order
+    within the given subtree, before and after the document changes
+    """
+    sections = [HTMLElement('section', val=[HTMLElement('p', {'class': 'item'}, str(index))
+                                            for index in range(SORTED_CANDIDATES_LIMIT)])
+                for _ in range(3)]
+    root = HTMLElement('div', val=sections)
+
+    def expected(element):
+        return [elem for elem in HTMLElement.iter_subtree(element) if elem.tag_name == 'p']
+
+    assert HTMLElement.find_elements_by_tag_name(root, 'p') == expected(root)
+    assert HTMLElement.select(sections[1], 'p.item') == expected(sections[1])
+
+    HTMLElement.append(sections[0], HTMLElement('p', {'class': 'item'}, 'new'))
+    HTMLElement.remove(sections[2], sections[2].value[0])
+    HTMLElement.append(sections[1].value[3], HTMLElement('p', val='nested'))
+    assert HTMLElement.find_elements_by_tag_name(root, 'p') == expected(root)
+    assert HTMLElement.find_elements_by_tag_name(sections[1], 'p') == expected(sections[1])
+    assert HTMLElement.find_first(root, 'p.item') is sections[0].value[0]
+
+
+def test_append_inside_itself():
+    """Test that appending an element to itself or under one of its descendants
+    raises ValueError and leaves the tree unchanged
+    """
+    grandchild = HTMLElement('span')
+    child = HTMLElement('p', val=grandchild)
+    root = HTMLElement('div', val=child)
+    with pytest.raises(ValueError):
+        HTMLElement.append(root, root)
+    with pytest.raises(ValueError):
+        HTMLElement.append(grandchild, root)
+    with pytest.raises(ValueError):
+        HTMLElement.append(grandchild, [HTMLElement('b'), child])
+    assert root.parent is None and child.parent is root and grandchild.parent is child
+    assert HTMLElement.render_fragment(root, None) == '<div><p><span></span></p></div>'
@@ -0,0 +1,130 @@
+"""Test parsing html into HTMLElement trees, whole and streaming"""
+import io
+
+import pytest
+
+from .html_framework import HTMLElement
+from .html_framework import TagNameError
+from .html_framework import SameIdException
+from .html_parser import iter_parse, parse_html
+
+
+@pytest.fixture
+def page():
+    """Fixture function that returns a page with nested elements, mixed text and numbers
+
+    Returns:
+        HTMLElement: root of the page
+    """
+    items = [HTMLElement('li', {'class': 'item', 'data-n': index}, f'item {index}')
+             for index in range(3)]
+    return HTMLElement('body', {'id': 'root'}, [
+        HTMLElement('article', {'id': 'first', 'class': 'post'}, [
+            HTMLElement('h2', val='First & best'),
+            HTMLElement('p', val=['Read ', HTMLElement('a', {'href': '/1'}, 'more'), ' now']),
+        ]),
+        HTMLElement('article', {'id': 'second', 'class': 'post'}, HTMLElement('ul', val=items)),
+    ])
+
+
+@pytest.mark.parametrize('minify', [False, True])
+def test_parse_rendered_html(page, minify):
+    """Test that parsing rendered html and rendering it again gives the same html
+
+    Args:
+        page (HTMLElement): root of the page
+        minify (bool): render without indentation and newlines
+    """
+    html = ''.join(HTMLElement.iter_render(page, minify=minify))
+    [document] = parse_html(io.StringIO(html), rendered=True)
+    assert ''.join(HTMLElement.iter_render(document, minify=minify)) == html
+    assert HTMLElement.get_element_by_id(document, 'second').parent is document
+    assert HTMLElement.find_first(document, 'li').attrs == {'class': 'item', 'data-n': 0}
+
+
+def test_parse_legacy_html():
+    """Test that void elements, attributes without value, entities and unclosed
+    elements are parsed, and that doc type and comments are skipped
+    """
+    html = ("<!DOCTYPE html><HTML><body><p>a &amp; b&#62;<br>c<!-- note --></p>"
+            "<ul><li class=x>1<li>2</ul><input disabled></body>")
+    [document] = parse_html(html)
+    assert HTMLElement.render(document, minify=True) == (
+        "<!DOCTYPE html><html><body><p>a &amp; b&#62;<br></br>c</p>"
+        "<ul><li class='x'>1</li><li>2</li></ul><input disabled=''></input></body></html>")
+
+    with pytest.raises(TagNameError):
+        parse_html('<div><blink>old</blink></div>')
+    with pytest.raises(SameIdException):
+        parse_html("<div id='same'><p id='same'></p></div>")
+
+
+def test_parse_implied_end_tags():
+    """Test that unclosed list items, paragraphs, rows and cells end where the next one
+    starts instead of nesting, and that streamed list items come one by one
+    """
+    [div] = parse_html("<div><p>a<p>b<ul><li>0<li>1</ul><dl><dt>t<dd>d</dl></div>")
+    assert HTMLElement.render_fragment(div, None) == (
+        "<div><p>a</p><p>b</p><ul><li>0</li><li>1</li></ul><dl><dt>t</dt><dd>d</dd></dl></div>")
+    [table] = parse_html("<table><tr><td>1<td>2<tr><th>3</table>")
+    assert HTMLElement.render_fragment(table, None) == (
+        "<table><tr><td>1</td><td>2</td></tr><tr><th>3</th></tr></table>")
+
+    html = "<ul>" + "".join(f"<li>{index}<ul><li>nested</ul>" for index in range(3)) + "</ul>"
+    items = list(iter_parse(html, 'ul > li'))
+    assert [item.value[0] for item in items] == ['0', '1', '2']
+    assert all(len(item.value) == 2 for item in items)
+
+    nested = HTMLElement('p', val=HTMLElement('p', val='inner'))
+    [document] = parse_html(HTMLElement.render_fragment(nested), rendered=True)
+    assert HTMLElement.render_fragment(document) == HTMLElement.render_fragment(nested)
+
+
+def test_parse_escaped_attributes():
+    """Test that attribute values with quotes and entities are rendered back as valid html"""
+    html = '<p title="it&#39;s &quot;x&quot;" href="?a=1&amp;b=2">x &amp; y</p>'
+    [paragraph] = parse_html(html)
+    assert paragraph.attrs == {'title': 'it&#x27;s &quot;x&quot;', 'href': '?a=1&amp;b=2'}
+    rendered = HTMLElement.render_fragment(paragraph, None)
+    assert rendered == ("<p title='it&#x27;s &quot;x&quot;' href='?a=1&amp;b=2'>x &amp; y</p>")
+    [reparsed] = parse_html(rendered)
+    assert reparsed.attrs == paragraph.attrs
+    assert HTMLElement.render_fragment(reparsed, None) == rendered
+
+
+def test_parse_number_attributes():
+    """Test that unquoted numbers become int values unless int() would change them"""
+    [elem] = parse_html("<div data-n=12 data-zip=02134 data-neg=-3 data-zero=0 data-m=-0>x</div>")
+    assert elem.attrs == {'data-n': 12, 'data-zip': '02134', 'data-neg': -3, 'data-zero': 0,
+                          'data-m': '-0'}
+
+
+def test_parse_keeps_whitespace():
+    """Test that whitespace between inline siblings and newlines in pre are kept,
+    unless the html is parsed as written by render()
+    """
+    html = "<p><b>big</b> <i>world</i></p><pre><b>x</b>\n  y\n</pre>"
+    paragraph, pre = parse_html(html)
+    assert paragraph.value[1] == ' ' and pre.value[1] == '\n  y\n'
+    assert ''.join(HTMLElement.render_fragment(elem, None) for elem in (paragraph, pre)) == html
+
+    paragraph, pre = parse_html(html, rendered=True)
+    assert len(paragraph.value) == 2 and pre.value[1] == '  y\n'
+
+
+def test_iter_parse_filter(page):
+    """Test the streaming mode that should yield only the matching subtrees,
+    detached from their ancestors, while html is fed in chunks
+
+    Args:
+        page (HTMLElement): root of the page
+    """
+    html = ''.join(HTMLElement.iter_render(page))
+    chunks = (html[start:start + 7] for start in range(0, len(html), 7))
+    items = list(iter_parse(chunks, 'article.post ul > li'))
+    assert [item.value for item in items] == [['item 0'], ['item 1'], ['item 2']]
+    assert all(item.parent is None for item in items)
+
+    articles = iter_parse(io.StringIO(html), lambda elem: elem.tag_name == 'article',
+                          chunk_size=16)
+    assert [article.elem_id for article in articles] == ['first', 'second']
@@ -0,0 +1,106 @@
+""" This module tests the instrumentation shared by the packages of this repository """
+import contextlib
+import io
+
+import pytest
+
+import instrumentation
+from cipher_equation.solution.encryption import Cipher
+from Count_letter_frequency_from_file.solution_count_letter.file_letter_frequency import (
+    LetterFrequency)
+from mimic_html_framework.html_framework import HTMLElement
+
+
+@pytest.fixture
+def recorded():
+    """ Record the calls made while the fixture is used, with a hook collecting them
+    Returns:
+        list: (path name, size) of every call seen by the hook
+    """
+    calls = []
+    hook = lambda name, seconds, size: calls.append((name, size))
+    instrumentation.reset()
+    instrumentation.add_hook(hook)
+    yield calls
+    instrumentation.disable()
+    instrumentation.remove_hook(hook)
+    instrumentation.reset()
+
+
+def test_instrumented_calls(recorded):
+    """ Ensure that calls are recorded only while instrumentation is enabled,
+    that hooks see every recorded call and that reset() drops the statistics
+    Returns:
+        bool
+    """
+    @instrumentation.instrumented(size=lambda args, result: len(result))
+    def upper(text):
+        return text.upper()
+
+    assert upper('not recorded') == 'NOT RECORDED'
+    instrumentation.enable()
+    upper('abc')
+    upper('abcde')
+    instrumentation.disable()
+    upper('not recorded')
+
+    name = upper.__qualname__
+    stats = instrumentation.snapshot()
+    assert recorded == [(name, 3), (name, 5)]
+    assert stats[name]['calls'] == 2 and stats[name]['size'] == 8
+    assert 0 < stats[name]['p50'] <= stats[name]['p99'] <= stats[name]['max']
+    instrumentation.reset()
+    assert not instrumentation.snapshot()
+
+
+def run_cipher(tmp_path):
+    """ Encrypt and decrypt a message
+    Returns:
+        dict: expected path name -> size
+    """
+    cipher = Cipher('ReemaR')
+    cipher.decrypt(cipher.encrypt('Hola Amigos'))
+    return {'Cipher.encrypt': 11, 'Cipher.decrypt': 11}
+
+
+def run_letter_frequency(tmp_path):
+    """ Read a file and count a letter
+    Returns:
+        dict: expected path name -> size
+    """
+    path = tmp_path / 'small.txt'
+    path.write_text("Hello, Wörld!\n" * 50, encoding='utf-8')
+    counter = LetterFrequency(str(path))
+    counter.read_file()
+    counter.letter_frequency('o')
+    return {'LetterFrequency.read_file': 700, 'LetterFrequency.letter_frequency': 700}
+
+
+def run_html_framework(tmp_path):
+    """ Append to, render and search an HTML tree
+    Returns:
+        dict: expected path name -> size
+    """
+    root = HTMLElement('div')
+    HTMLElement.append(root, [HTMLElement('p'), 'text'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        html = HTMLElement.render(root)
+    HTMLElement.find_elements_by_tag_name(root, 'p')
+    return {'HTMLElement.append': 2, 'HTMLElement.render': len(html),
+            'HTMLElement.find_elements_by_tag_name': 1}
+
+
+@pytest.mark.parametrize('run', [run_cipher, run_letter_frequency, run_html_framework])
+def test_package_paths(recorded, tmp_path, run):
+    """ Ensure that the hot paths of every package are recorded in the shared statistics
+    with the size they processed
+    Returns:
+        bool
+    """
+    instrumentation.enable()
+    expected = run(tmp_path)
+    instrumentation.disable()
+
+    stats = instrumentation.snapshot()
+    assert {name: stats[name]['size'] for name in expected} == expected
+    assert all(stats[name]['calls'] == 1 for name in expected)